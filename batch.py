@@ -0,0 +1,195 @@
+"""Headless batch mode: run a JSONL file of requests, stream results to JSONL
+
+Each input line is a JSON object:
+
+    {"id": "r1", "message": "Add docstrings to ...", "template": "Documentation", "project_context": true}
+
+Only "message" is required; "id" defaults to the line number. Usage:
+
+    python orbit.py batch requests.jsonl results.jsonl
+
+Re-running with the same output file resumes after a crash: finished ids
+are skipped. Requests that errored are retried, so an id can have an
+error line followed by a later result; the last line for an id wins.
+Identical prompts are generated once, and requests sharing a
+template/project-context combination run back to back so the evaluated
+system prefix is reused.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from context import ContextManager
+from model import OrbitModel
+
+
+def read_requests(path: Path) -> List[dict]:
+    """Parse the input file, giving every request an id"""
+    requests = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                request = {"error": f"invalid JSON: {e}"}
+            if not isinstance(request, dict):
+                request = {"error": f"expected a JSON object, got {type(request).__name__}"}
+            request.setdefault("id", str(line_no))
+            request["id"] = str(request["id"])
+            requests.append(request)
+    return requests
+
+
+def read_finished(path: Path) -> Dict[str, dict]:
+    """
+    Load results already written to the output file, keyed by id
+
+    A partial last line (from a crash mid-write) is cut off so new results
+    append cleanly. Errored requests are not treated as finished, so a
+    resumed run retries them.
+    """
+    if not path.exists():
+        return {}
+
+    data = path.read_bytes()
+    complete = data[:data.rfind(b"\n") + 1]
+    if len(complete) != len(data):
+        with open(path, 'r+b') as f:
+            f.truncate(len(complete))
+
+    finished = {}
+    for line in complete.decode('utf-8').splitlines():
+        try:
+            result = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if "response" in result:
+            finished[str(result["id"])] = result
+    return finished
+
+
+def template_name(request: dict) -> Optional[str]:
+    """Display name of the request's template (accepts "code_review" or "Code Review")"""
+    template = request.get("template")
+    return template.replace('_', ' ').title() if template else None
+
+
+def prompt_key(tokens: List[int]) -> str:
+    """Identity of a fully built prompt, for deduplication"""
+    return hashlib.sha256(array('i', tokens).tobytes()).hexdigest()[:16]
+
+
+class BatchRunner:
+    """Builds, deduplicates, orders and runs batch requests"""
+
+    def __init__(self, model: OrbitModel, context_mgr: ContextManager, output_path: Path):
+        self.model = model
+        self.context_mgr = context_mgr
+        self.output_path = output_path
+
+    def build(self, request: dict) -> List[int]:
+        """Prompt tokens for a standalone request (no conversation history)"""
+        self.context_mgr.clear_history()
+        self.context_mgr.current_template = None
+        template = template_name(request)
+        if template and self.context_mgr.load_template(template) is None:
+            raise ValueError(f"Unknown template: {template}")
+        return self.context_mgr.build_prompt_tokens(
+            request["message"],
+            override_project_context=not request.get("project_context", True),
+        )
+
+    def write(self, result: dict):
+        """Append one result and make sure it reaches the disk"""
+        with open(self.output_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def run(self, requests: List[dict]):
+        """Run every request not already in the output file"""
+        finished = read_finished(self.output_path)
+        pending = [r for r in requests if r["id"] not in finished]
+        print(f"📋 {len(requests)} requests, {len(requests) - len(pending)} already done, {len(pending)} to run")
+
+        # Build prompts and group identical ones
+        groups: Dict[str, dict] = {}
+        for request in pending:
+            if "error" in request or "message" not in request:
+                self.write({"id": request["id"], "error": request.get("error", "missing 'message'")})
+                continue
+            try:
+                tokens = self.build(request)
+            except Exception as e:
+                self.write({"id": request["id"], "error": str(e)})
+                continue
+            key = prompt_key(tokens)
+            group = groups.setdefault(key, {
+                "tokens": tokens,
+                "requests": [],
+                "prefix": (template_name(request) or "", bool(request.get("project_context", True))),
+            })
+            group["requests"].append(request)
+
+        # Answers from a previous run can serve duplicates directly
+        previous = {r.get("prompt_key"): r for r in finished.values()}
+
+        # Requests with the same system block back to back, so its KV state is reused
+        ordered = sorted(groups.items(), key=lambda item: item[1]["prefix"])
+        for index, (key, group) in enumerate(ordered, start=1):
+            ids = [r["id"] for r in group["requests"]]
+            if key in previous:
+                response, metrics = previous[key]["response"], None
+            else:
+                started = time.perf_counter()
+                try:
+                    response = "".join(self.model.generate(group["tokens"], stream=True))
+                except Exception as e:
+                    for request in group["requests"]:
+                        self.write({"id": request["id"], "error": str(e)})
+                    print(f"❌ [{index}/{len(ordered)}] {', '.join(ids)}: {e}")
+                    continue
+                metrics = self.model.last_metrics.to_dict()
+                print(f"✅ [{index}/{len(ordered)}] {', '.join(ids)} ({time.perf_counter() - started:.1f}s)")
+
+            for position, request in enumerate(group["requests"]):
+                result = {
+                    "id": request["id"],
+                    "template": request.get("template"),
+                    "project_context": bool(request.get("project_context", True)),
+                    "prompt_key": key,
+                    "response": response,
+                }
+                if position == 0 and metrics is not None:
+                    result["metrics"] = metrics
+                else:
+                    result["deduplicated"] = True
+                self.write(result)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Entry point for `python orbit.py batch`"""
+    parser = argparse.ArgumentParser(prog="orbit batch", description="Run a JSONL file of requests headlessly")
+    parser.add_argument("input", type=Path, help="JSONL file of requests")
+    parser.add_argument("output", type=Path, help="JSONL results file (appended to, resumable)")
+    parser.add_argument("--config", default="config.yaml", help="config file")
+    args = parser.parse_args(argv)
+
+    model = OrbitModel(args.config)
+    context_mgr = ContextManager(args.config)
+    context_mgr.set_tokenizer(model.tokenize, model.context_size())
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    BatchRunner(model, context_mgr, args.output).run(read_requests(args.input))
+    print(f"💾 Results in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Offline benchmark: time-to-first-token, prefill and decode throughput
+
+Runs a fixed set of prompts through ContextManager and OrbitModel.generate
+and writes JSON results that can be compared across runs:
+
+    python orbit.py bench                      # configured model
+    python orbit.py bench --stub               # no GGUF needed (CI)
+    python orbit.py bench --compare bench_results/previous.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from config import SharedConfig
+from context import ContextManager
+from model import OrbitModel
+
+
+STUB_MODEL = "stub"
+
+_SAMPLE_CODE = '''def load_users(path):
+    users = []
+    f = open(path)
+    for line in f.readlines():
+        parts = line.strip().split(",")
+        if len(parts) == 3:
+            users.append({"name": parts[0], "email": parts[1], "age": int(parts[2])})
+    return users
+'''
+
+BENCH_PROMPTS = [
+    {
+        "name": "short_question",
+        "message": "What's the difference between a list and a tuple in Python?",
+    },
+    {
+        "name": "code_generation",
+        "template": "Code Generation",
+        "message": "Write a FastAPI endpoint that creates a user with input validation.",
+    },
+    {
+        "name": "refactor",
+        "template": "Refactor",
+        "message": f"Refactor this function:\n```python\n{_SAMPLE_CODE}```",
+    },
+    {
+        "name": "code_review",
+        "template": "Code Review",
+        "message": f"Review this code:\n```python\n{_SAMPLE_CODE}```",
+    },
+    {
+        "name": "follow_up",
+        "message": "Now add type hints and a docstring.",
+        "history": [
+            ("user", f"Refactor this function:\n```python\n{_SAMPLE_CODE}```"),
+            ("assistant", f"Here is a cleaner version:\n```python\n{_SAMPLE_CODE}```"),
+        ],
+    },
+]
+
+METRICS = ["build_ms", "ttft_s", "prompt_tps", "decode_tps", "total_s"]
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB (None if unknown)"""
+    try:
+        import resource
+    except ImportError:
+        # Windows: peak working set via psutil, if installed
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except (ImportError, AttributeError):
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_case(model: OrbitModel, context_mgr: ContextManager, case: dict) -> dict:
+    """Run one benchmark prompt and time each phase"""
+    context_mgr.clear_history()
+    context_mgr.current_template = None
+    if case.get("template"):
+        context_mgr.load_template(case["template"])
+    for role, content in case.get("history", []):
+        context_mgr.add_to_history(role, content)
+
+    started = time.perf_counter()
+    prompt = context_mgr.build_prompt_tokens(case["message"])
+    built = time.perf_counter()
+
+    for _ in model.generate(prompt, stream=True):
+        pass
+    metrics = model.last_metrics
+
+    return {
+        "name": case["name"],
+        "prompt_tokens": metrics.prompt_tokens,
+        "cached_tokens": metrics.cached_tokens,
+        "restored_tokens": metrics.restored_tokens,
+        "prefix_source": metrics.prefix_source,
+        "output_tokens": metrics.output_tokens,
+        "stop_reason": metrics.stop_reason,
+        "build_ms": (built - started) * 1000,
+        "ttft_s": metrics.ttft_s,
+        "prefill_s": metrics.prefill_s,
+        "prompt_tps": metrics.prefill_tps,
+        "decode_tps": metrics.decode_tps,
+        "total_s": time.perf_counter() - started,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def summarize(results: List[dict]) -> dict:
+    """Median of each metric across all runs"""
+    summary = {m: statistics.median(r[m] for r in results) for m in METRICS}
+    peaks = [r["peak_rss_mb"] for r in results if r["peak_rss_mb"] is not None]
+    summary["peak_rss_mb"] = max(peaks) if peaks else None
+    return summary
+
+
+def print_results(results: List[dict], summary: dict):
+    """Print a per-run table and the summary"""
+    print(f"\n{'prompt':<16} {'tokens':>7} {'build ms':>9} {'TTFT s':>8} {'prefill t/s':>12} {'decode t/s':>11}")
+    for r in results:
+        print(
+            f"{r['name']:<16} {r['prompt_tokens']:>7} {r['build_ms']:>9.2f} {r['ttft_s']:>8.3f} "
+            f"{r['prompt_tps']:>12.1f} {r['decode_tps']:>11.1f}"
+        )
+    peak = f"{summary['peak_rss_mb']:.0f} MB" if summary['peak_rss_mb'] is not None else "n/a"
+    print(
+        f"\nMedian: TTFT {summary['ttft_s']:.3f}s • prefill {summary['prompt_tps']:.1f} t/s • "
+        f"decode {summary['decode_tps']:.1f} t/s • peak RSS {peak}"
+    )
+
+
+def print_comparison(summary: dict, baseline_path: Path):
+    """Print summary deltas against a previous results file"""
+    baseline = json.loads(baseline_path.read_text())["summary"]
+    print(f"\nCompared with {baseline_path}:")
+    for metric in METRICS + ["peak_rss_mb"]:
+        old, new = baseline.get(metric), summary[metric]
+        if not old or new is None:
+            continue
+        print(f"  {metric:<12} {old:>10.3f} → {new:>10.3f} ({(new - old) / old * 100:+.1f}%)")
+
+
+def run(args: argparse.Namespace) -> dict:
+    """Run the benchmark and return the results document"""
+    if not args.stub:
+        return run_benchmark(args)
+    # Stub prefix snapshots and cached answers go to a throwaway dir, not the real .orbit_cache
+    with tempfile.TemporaryDirectory(prefix="orbit-bench-") as cache_dir:
+        SharedConfig.load(args.config).data.setdefault('cache', {})['dir'] = cache_dir
+        return run_benchmark(args)
+
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    """Load the model and time every prompt"""
+    model = OrbitModel(args.config)
+    if args.stub:
+        model.config.setdefault('models', []).append({"name": STUB_MODEL, "path": "", "backend": "stub"})
+        model.use_model(STUB_MODEL)
+    model.config['generation']['max_tokens'] = args.max_tokens
+
+    context_mgr = ContextManager(args.config)
+    context_mgr.set_tokenizer(model.tokenize, model.context_size())
+
+    print(f"🏁 Benchmarking {model.active_model} ({args.runs} run(s) x {len(BENCH_PROMPTS)} prompts)")
+    model.get_llm()  # Keep load time out of the measurements
+
+    results = []
+    for run_index in range(args.runs):
+        for case in BENCH_PROMPTS:
+            result = run_case(model, context_mgr, case)
+            result["run"] = run_index
+            results.append(result)
+
+    summary = summarize(results)
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "model": model.active_model,
+        "load_s": model.load_seconds.get(model.active_model),
+        "performance": model.config['performance'],
+        "generation": model.config['generation'],
+        "results": results,
+        "summary": summary,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    """Entry point for `python orbit.py bench`"""
+    parser = argparse.ArgumentParser(prog="orbit bench", description="Benchmark Orbit's generation pipeline")
+    parser.add_argument("--config", default="config.yaml", help="config file to benchmark")
+    parser.add_argument("--stub", action="store_true", help="use the deterministic stub backend (no GGUF)")
+    parser.add_argument("--runs", type=int, default=2, help="repetitions of the prompt set")
+    parser.add_argument("--max-tokens", type=int, default=128, help="tokens to generate per prompt")
+    parser.add_argument("--output", help="results file (default: bench_results/<timestamp>.json)")
+    parser.add_argument("--compare", type=Path, help="previous results file to compare against")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    print_results(report["results"], report["summary"])
+    if args.compare:
+        print_comparison(report["summary"], args.compare)
+
+    output = Path(args.output or f"bench_results/{datetime.now():%Y%m%d-%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\n💾 Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
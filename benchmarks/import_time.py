@@ -0,0 +1,82 @@
+"""
+Startup regression check: import time of Orbit's entry points
+
+Runs each entry point in a fresh interpreter with `-X importtime`, reports
+the total and heaviest imports, and fails if a heavy dependency is pulled
+in where it shouldn't be or a time budget is exceeded.
+
+Run from the repo root:
+    python benchmarks/import_time.py [--top 8] [--budget-ms 300]
+"""
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# (label, python args, modules that must NOT be imported)
+CASES = [
+    ("orbit --version", ["orbit.py", "--version"], ["llama_cpp", "rich", "prompt_toolkit", "yaml", "gradio"]),
+    ("orbit --check", ["orbit.py", "--check"], ["llama_cpp", "gradio"]),
+    ("import orbit_web", ["-c", "import orbit_web"], ["llama_cpp", "gradio", "rich"]),
+    ("import model, context", ["-c", "import model, context"], ["llama_cpp", "rich", "prompt_toolkit", "gradio"]),
+]
+
+_LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def import_times(args: List[str]) -> Dict[str, Tuple[int, int]]:
+    """Run python -X importtime with args; return {module: (self_us, cumulative_us)}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            times[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return times
+
+
+def total_us(times: Dict[str, Tuple[int, int]]) -> int:
+    """Total import time in microseconds (sum of self times)"""
+    return sum(self_us for self_us, _ in times.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time regression check")
+    parser.add_argument("--top", type=int, default=8, help="heaviest imports to list per case")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail if any case imports for longer")
+    args = parser.parse_args()
+
+    failures = []
+    for label, case_args, forbidden in CASES:
+        times = import_times(case_args)
+        total_ms = total_us(times) / 1000
+        print(f"\n{label}: {total_ms:.1f} ms, {len(times)} modules")
+
+        packages = {name.split('.')[0] for name in times}
+        leaked = [m for m in forbidden if m in packages]
+        if leaked:
+            failures.append(f"{label} imports {', '.join(leaked)}")
+
+        heaviest = sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+        for name, (self_us, _) in heaviest:
+            print(f"  {self_us / 1000:7.1f} ms  {name}")
+
+        if args.budget_ms is not None and total_ms > args.budget_ms:
+            failures.append(f"{label} took {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    if failures:
+        print("\n❌ " + "\n❌ ".join(failures))
+        sys.exit(1)
+    print("\n✅ No heavy imports at startup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: aggregate decode throughput of the web worker pool as workers grow
+
+Starts a WorkerPool with 1, 2, 4, ... processes, sends the same number of
+concurrent requests from distinct sessions to each, and reports aggregate
+and per-request tokens/s. With --stub the model is the deterministic stub
+with a fixed per-token delay, which measures the pool's dispatch and relay
+overhead; with a real GGUF it shows how far splitting the cores between
+llama.cpp contexts beats one context using all of them.
+
+Run from the repo root:
+    python benchmarks/pool_throughput.py --stub
+    python benchmarks/pool_throughput.py --workers 1 2 4 --requests 8
+"""
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pool import WorkerPool
+
+
+PROMPT = "<|im_start|>user\nWrite a Python function that parses a YAML config file.<|im_end|>\n<|im_start|>assistant\n"
+
+
+def stub_config(source: str, decode_delay: float, directory: str) -> str:
+    """Copy of the config with the stub backend as the model (no GGUF needed)"""
+    import yaml
+    with open(source) as f:
+        config = yaml.safe_load(f)
+    config['model'] = {"name": "stub", "path": "", "backend": "stub", "stub": {"decode_delay": decode_delay}}
+    config['models'] = []
+    config.setdefault('cache', {})['prefix_states'] = False
+    config['cache']['responses'] = False
+    path = Path(directory) / "config.yaml"
+    path.write_text(yaml.safe_dump(config))
+    return str(path)
+
+
+def run(config_path: str, workers: int, requests: int, max_tokens: int) -> dict:
+    """Time `requests` concurrent generations on a pool of `workers` processes"""
+    pool = WorkerPool(config_path, workers)
+    pool.start()
+    try:
+        pool.submit("warmup", PROMPT, max_tokens=1).wait()
+
+        tokens: List[int] = [0] * requests
+        seconds: List[float] = [0.0] * requests
+
+        def client(i: int):
+            started = time.perf_counter()
+            for _ in pool.submit(f"session-{i}", PROMPT, max_tokens=max_tokens):
+                tokens[i] += 1
+            seconds[i] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(requests)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+    finally:
+        pool.close()
+
+    return {
+        "workers": workers,
+        "tokens": sum(tokens),
+        "wall_s": wall,
+        "aggregate_tps": sum(tokens) / wall if wall else 0.0,
+        "per_request_tps": sum(t / s for t, s in zip(tokens, seconds) if s) / requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", default="config.yaml", help="config file (its model is benchmarked)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="pool sizes to measure")
+    parser.add_argument("--requests", type=int, default=8, help="concurrent requests per pool size")
+    parser.add_argument("--max-tokens", type=int, default=64, help="tokens generated per request")
+    parser.add_argument("--stub", action="store_true", help="use the stub backend (no GGUF needed)")
+    parser.add_argument("--decode-delay", type=float, default=0.01, help="stub seconds per token")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = stub_config(args.config, args.decode_delay, tmp) if args.stub else args.config
+
+        results = [run(config_path, workers, args.requests, args.max_tokens) for workers in args.workers]
+
+    print(f"\n{'workers':>8} {'tokens':>8} {'wall s':>8} {'aggregate tok/s':>16} {'per-request tok/s':>18}")
+    baseline = results[0]['aggregate_tps']
+    for result in results:
+        speedup = result['aggregate_tps'] / baseline if baseline else 0.0
+        print(f"{result['workers']:>8} {result['tokens']:>8} {result['wall_s']:>8.2f} "
+              f"{result['aggregate_tps']:>16.1f} {result['per_request_tps']:>18.1f}  ({speedup:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
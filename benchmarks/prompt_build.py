@@ -0,0 +1,78 @@
+"""
+Micro-benchmark: per-turn prompt build + tokenize time as history grows
+
+Compares the text path (build_prompt, then tokenizing the whole prompt the
+way llama.cpp does for a string) with the token path (build_prompt_tokens,
+which only tokenizes the new message). Uses a pure-Python stand-in
+tokenizer so it runs without a GGUF file.
+
+Run from the repo root:
+    python benchmarks/prompt_build.py [--turns 200]
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from context import ContextManager
+
+
+_TOKEN_RE = re.compile(r"<\|im_(?:start|end)\|>|\w+|\s+|[^\w\s]")
+
+
+class StubTokenizer:
+    """Deterministic word-level tokenizer with a cost proportional to text length"""
+
+    def __init__(self):
+        self.vocab = {}
+
+    def __call__(self, text: str, add_bos: bool = False) -> list:
+        return [self.vocab.setdefault(piece, len(self.vocab)) for piece in _TOKEN_RE.findall(text)]
+
+
+def run(turns: int, report_every: int):
+    """Simulate a conversation and print per-turn timings for both paths"""
+    tokenizer = StubTokenizer()
+    context_mgr = ContextManager()
+    context_mgr.set_tokenizer(tokenizer)
+
+    # Let history grow for the whole run
+    context_mgr.config['context']['max_history'] = turns
+    context_mgr.config['performance']['n_ctx'] = 10 ** 9
+
+    answer = "Here is the updated function:\n```python\n" + "x = compute(x, y)  # step\n" * 40 + "```"
+
+    print(f"{'turn':>6} {'history tok':>12} {'text path ms':>13} {'token path ms':>14}")
+    for turn in range(1, turns + 1):
+        message = f"Question {turn}: how do I refactor the helper in module_{turn}.py?"
+
+        start = time.perf_counter()
+        prompt = context_mgr.build_prompt(message)
+        tokenizer(prompt, add_bos=True)
+        text_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        context_mgr.build_prompt_tokens(message)
+        token_ms = (time.perf_counter() - start) * 1000
+
+        context_mgr.add_to_history("user", message)
+        context_mgr.add_to_history("assistant", answer)
+
+        if turn == 1 or turn % report_every == 0:
+            history_tokens = context_mgr.get_context_info()['history_tokens']
+            print(f"{turn:>6} {history_tokens:>12} {text_ms:>13.3f} {token_ms:>14.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200, help="conversation turns to simulate")
+    parser.add_argument("--every", type=int, default=25, help="print a row every N turns")
+    args = parser.parse_args()
+    run(args.turns, args.every)
+
+
+if __name__ == "__main__":
+    main()
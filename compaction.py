@@ -0,0 +1,66 @@
+"""Compaction of static context files: fewer prefill tokens for the same rules"""
+import re
+from typing import Iterable, List
+
+
+# Lines dropped by default: HTML comments, "# Edit this file..." style
+# instructions and example lines (override with context.compact_patterns)
+DEFAULT_PATTERNS = [
+    r"^\s*<!--.*-->\s*$",
+    r"^\s*#\s*(Edit|Replace|Fill in|Customi[sz]e|TODO)\b",
+    r"^\s*(Example|e\.g\.)\b",
+]
+
+_BULLET_RE = re.compile(r"^\s*(?:[-*•+]|\d+[.)])\s+(.*)$")
+_SPACES_RE = re.compile(r"[ \t]{2,}")
+
+
+def compact_text(text: str, patterns: Iterable[str] = DEFAULT_PATTERNS) -> str:
+    """
+    Normalize one file's whitespace and drop comment/example lines
+
+    Trailing whitespace goes, runs of spaces inside a line become one, and
+    blank runs collapse to a single blank line. Indentation is kept.
+    """
+    comment_res = [re.compile(p) for p in patterns]
+    lines = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        if any(r.search(line) for r in comment_res):
+            continue
+        stripped = line.lstrip()
+        line = line[:len(line) - len(stripped)] + _SPACES_RE.sub(" ", stripped)
+        if not line and (not lines or not lines[-1]):
+            continue
+        lines.append(line)
+    while lines and not lines[-1]:
+        lines.pop()
+    return "\n".join(lines)
+
+
+def _rule_key(bullet: str) -> str:
+    """Case-, spacing- and punctuation-insensitive identity of a bullet rule"""
+    return re.sub(r"[^\w]+", " ", bullet).strip().lower()
+
+
+def dedupe_bullets(texts: List[str]) -> List[str]:
+    """
+    Drop bullet rules already stated earlier, in the same text or a previous one
+
+    Texts are given in prompt order (system, project, conventions,
+    template), so a rule is kept where it first appears.
+    """
+    seen = set()
+    result = []
+    for text in texts:
+        kept = []
+        for line in text.split("\n"):
+            match = _BULLET_RE.match(line)
+            if match:
+                key = _rule_key(match.group(1))
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.append(line)
+        result.append("\n".join(kept))
+    return result
@@ -0,0 +1,128 @@
+"""Shared, hot-reloadable config.yaml"""
+import threading
+import weakref
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from file_cache import file_signature
+
+
+# (dotted.field.path, old value, new value)
+Change = Tuple[str, Any, Any]
+
+
+def diff(old: Any, new: Any, prefix: str = "") -> List[Change]:
+    """Leaf-level differences between two parsed configs"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = []
+        for key in list(old) + [k for k in new if k not in old]:
+            path = f"{prefix}.{key}" if prefix else str(key)
+            changes.extend(diff(old.get(key), new.get(key), path))
+        return changes
+    return [] if old == new else [(prefix, old, new)]
+
+
+class SharedConfig:
+    """
+    One parsed config.yaml per file, shared by OrbitModel and ContextManager
+
+    check() re-reads the file when its mtime/size changed and passes the
+    changed fields to every subscriber. A file that fails to parse is
+    reported and ignored, keeping the last good config.
+    """
+
+    _instances: Dict[Path, "SharedConfig"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.data: dict = self._parse()
+        self._signature = file_signature(self.path)
+        self._subscribers: List[weakref.ref] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str = "config.yaml") -> "SharedConfig":
+        """The shared instance for path (created on first use)"""
+        key = Path(path).resolve()
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(path)
+            return cls._instances[key]
+
+    def _parse(self) -> dict:
+        import yaml  # Deferred: only needed once a config is read
+        with open(self.path, 'r') as f:
+            return yaml.safe_load(f)
+
+    def subscribe(self, callback: Callable[[List[Change]], None]):
+        """
+        Call callback(changes) after each reload that changed something
+
+        Bound methods are held weakly, so a subscribed object (e.g. a web
+        session's ContextManager) can still be garbage collected.
+        """
+        ref = weakref.WeakMethod(callback) if hasattr(callback, '__self__') else (lambda: callback)
+        with self._lock:
+            self._subscribers.append(ref)
+
+    def check(self) -> List[Change]:
+        """Reload if the file changed on disk; returns the changed fields"""
+        import yaml
+        with self._lock:
+            signature = file_signature(self.path)
+            if signature == self._signature:
+                return []
+            self._signature = signature
+            try:
+                data = self._parse()
+            except (OSError, yaml.YAMLError) as e:
+                print(f"⚠️  {self.path} not reloaded: {e}")
+                return []
+            if not isinstance(data, dict):
+                return []
+
+            changes = diff(self.data, data)
+            self.data = data
+            subscribers = [ref() for ref in self._subscribers]
+            self._subscribers = [ref for ref, callback in zip(self._subscribers, subscribers) if callback]
+
+        if changes:
+            for callback in subscribers:
+                if callback is not None:
+                    callback(changes)
+        return changes
+
+
+def changed_sections(changes: List[Change]) -> set:
+    """Top-level config sections touched by changes"""
+    return {path.split('.')[0] for path, _, _ in changes}
+
+
+def _model_paths(models: Any) -> Dict[str, Any]:
+    """name -> path for a `models` list"""
+    return {m.get('name'): m.get('path') for m in models or [] if isinstance(m, dict)}
+
+
+def model_path(config: Dict[str, Any], name: str) -> Optional[str]:
+    """GGUF path registered for a model name (the `model` entry wins, as in OrbitModel)"""
+    if config['model'].get('name') == name:
+        return config['model'].get('path')
+    return _model_paths(config.get('models')).get(name)
+
+
+def model_paths_changed(changes: List[Change]) -> bool:
+    """True if a registered model now points at a different GGUF file (and so maybe a different vocabulary)"""
+    for path, old, new in changes:
+        if path == "model.path":
+            return True
+        if path == "models":
+            old_paths, new_paths = _model_paths(old), _model_paths(new)
+            if any(old_paths[name] != new_paths[name] for name in old_paths.keys() & new_paths.keys()):
+                return True
+    return False
+
+
+def describe(changes: List[Change]) -> List[str]:
+    """Human-readable "field: old -> new" lines"""
+    return [f"{path}: {old} → {new}" for path, old, new in changes]
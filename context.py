@@ -1,31 +1,82 @@
 """Simple context manager for Orbit"""
 from pathlib import Path
-from typing import List, Dict
-import yaml
+from typing import Callable, List, Dict, Optional
+
+from config import Change, SharedConfig, changed_sections, model_path, model_paths_changed
+from compaction import DEFAULT_PATTERNS, compact_text, dedupe_bullets
+from file_cache import FileCache, file_signature
+from memory import AUTO_N_CTX_MIN
+from retrieval import CodeIndex, create_index
+
+
+ASSISTANT_HEADER = "<|im_start|>assistant\n"
+USER_HEADER = "<|im_start|>user\n"
 
 
 class ContextManager:
     """Loads and manages project context - simple text file based"""
     
-    def __init__(self, config_path: str = "config.yaml"):
-        self.config = self._load_config(config_path)
+    def __init__(
+        self,
+        config_path: str = "config.yaml",
+        file_cache: Optional[FileCache] = None,
+        code_index: Optional[CodeIndex] = None,
+    ):
+        self.shared_config = SharedConfig.load(config_path)
+        self.shared_config.subscribe(self._on_config_change)
         self.contexts_dir = Path("contexts")
         self.templates_dir = Path("templates")
-        self.conversation_history: List[Dict[str, str]] = []
+        self.conversation_history: List[Dict] = []
         self.current_template: str = None
+        self.file_cache = file_cache if file_cache is not None else FileCache()
+        
+        # Token accounting for the history budget (see set_tokenizer)
+        self.tokenizer: Optional[Callable[[str], List[int]]] = None
+        self.vocab: Optional[str] = None  # Model name the tokenizer belongs to (shares memoized IDs across instances)
+        self.n_ctx: Optional[int] = None  # Resolved by the model when config says `auto`
+        self._history_tokens = 0
+        self._static_tokens = 0
+        self._pending_message = None  # (role, content, ids) tokenized by build_prompt
+        self._header_ids: Optional[List[int]] = None
+        self._vocab_version = 0  # Bumped on re-encoding, so memoized system IDs are recomputed
+        self._vocab_changed = False  # A model's path changed: re-encode before the next prompt
+        
+        # Summary of turns evicted from history (context.summarize, see apply_summary)
+        self.summary = ""
+        self._summary_ids: Optional[List[int]] = None
+        self._evicted: List[Dict] = []  # Dropped before they could be summarized
+        
+        # Relevant source chunks are added to each user turn (see _retrieve)
+        self._owns_index = code_index is None
+        self.code_index = code_index if code_index is not None else create_index(self.config)
+        self.last_retrieval = {"chunks": 0, "tokens": 0}
     
-    def _load_config(self, path: str) -> dict:
-        """Load configuration"""
-        with open(path, 'r') as f:
-            return yaml.safe_load(f)
+    @property
+    def config(self) -> dict:
+        """The current config.yaml (reloaded by shared_config.check())"""
+        return self.shared_config.data
+    
+    def _on_config_change(self, changes: List[Change]):
+        """Apply a reloaded config: re-fit history to new limits, rebuild an own code index"""
+        sections = changed_sections(changes)
+        if sections & {'context', 'performance', 'generation'}:
+            self._trim_history()
+        if 'retrieval' in sections and self._owns_index:
+            self.code_index = create_index(self.config)
+        if model_paths_changed(changes):
+            # Deferred: the model may not have switched vocabularies yet (subscriber order)
+            self._vocab_changed = True
+    
+    def _reencode_if_vocab_changed(self):
+        """Re-tokenize history and system IDs after a model's GGUF path changed"""
+        if self._vocab_changed and self.tokenizer is not None:
+            self._vocab_changed = False
+            self.set_tokenizer(self.tokenizer, vocab=self.vocab)
     
     def list_templates(self) -> List[str]:
         """List all available templates"""
-        if not self.templates_dir.exists():
-            return []
-        
         templates = []
-        for template_file in self.templates_dir.glob("*.txt"):
+        for template_file in self.file_cache.glob(self.templates_dir, "*.txt"):
             # Convert filename to display name (e.g., code_generation.txt -> Code Generation)
             name = template_file.stem.replace('_', ' ').title()
             templates.append(name)
@@ -37,86 +88,462 @@ class ContextManager:
         filename = template_name.lower().replace(' ', '_') + '.txt'
         template_file = self.templates_dir / filename
         
-        if template_file.exists():
+        content = self.file_cache.read_text(template_file)
+        if content is not None:
             self.current_template = template_name
-            return template_file.read_text()
-        return None
+        return content
+    
+    def _template_path(self) -> Optional[Path]:
+        """Path of the active template file, if any"""
+        if not self.current_template:
+            return None
+        return self.templates_dir / (self.current_template.lower().replace(' ', '_') + '.txt')
     
-    def load_context_files(self, override_project_context: bool = False) -> str:
+    def _static_sources(self, override_project_context: bool) -> List[Path]:
+        """Files that make up the static context for this request"""
+        context_config = self.config['context']
+        sources = []
+        if context_config['load_system']:
+            sources.append(self.contexts_dir / "system.txt")
+        if context_config['load_project'] and not override_project_context:
+            sources.append(self.contexts_dir / "project.txt")
+        if context_config['load_conventions']:
+            sources.append(self.contexts_dir / "conventions.txt")
+        if self.current_template:
+            sources.append(self._template_path())
+        return sources
+    
+    def load_context_files(self, override_project_context: bool = False, compact: Optional[bool] = None) -> str:
         """Load all enabled context files
         
+        The rendered result is cached and only rebuilt when one of the
+        source files changes (mtime/size) or the selection changes.
+        
         Args:
             override_project_context: If True, skip loading project.txt for this request
+            compact: Apply prompt compaction (default: context.compact from config)
+        """
+        if compact is None:
+            compact = self.config['context'].get('compact', False)
+        patterns = tuple(self.config['context'].get('compact_patterns') or DEFAULT_PATTERNS)
+        sources = self._static_sources(override_project_context)
+        signature = (tuple((path, file_signature(path)) for path in sources), patterns)
+        return self.file_cache.memo(
+            ('static_context', override_project_context, self.current_template, compact),
+            signature,
+            lambda: self._render_context_files(override_project_context, compact, patterns),
+        )
+    
+    def _read_static(self, path: Path, compact: bool, patterns: tuple) -> Optional[str]:
+        """A context/template file, compacted if requested (cached per file version)"""
+        text = self.file_cache.read_text(path)
+        if text is None or not compact:
+            return text
+        return self.file_cache.memo(
+            ('compacted', path),
+            (file_signature(path), patterns),
+            lambda: compact_text(text, patterns),
+        )
+    
+    def _render_context_files(self, override_project_context: bool, compact: bool = False,
+                              patterns: tuple = tuple(DEFAULT_PATTERNS)) -> str:
+        """
+        Assemble the static context text from the (cached) source files
+        
+        With compact, each file is compacted (see compaction.py) and bullet
+        rules repeated across files are kept only where they first appear.
         """
         context_config = self.config['context']
-        context_parts = []
+        sections = []  # (heading, text)
         
         # Load system rules
         if context_config['load_system']:
-            system_file = self.contexts_dir / "system.txt"
-            if system_file.exists():
-                context_parts.append(f"# SYSTEM RULES\n{system_file.read_text()}")
+            system_text = self._read_static(self.contexts_dir / "system.txt", compact, patterns)
+            if system_text is not None:
+                sections.append(("# SYSTEM RULES", system_text))
         
         # Load project info (unless overridden)
         if context_config['load_project'] and not override_project_context:
-            project_file = self.contexts_dir / "project.txt"
-            if project_file.exists():
-                context_parts.append(f"\n# PROJECT INFO\n{project_file.read_text()}")
+            project_text = self._read_static(self.contexts_dir / "project.txt", compact, patterns)
+            if project_text is not None:
+                sections.append(("\n# PROJECT INFO", project_text))
         
         # Load coding conventions
         if context_config['load_conventions']:
-            conventions_file = self.contexts_dir / "conventions.txt"
-            if conventions_file.exists():
-                context_parts.append(f"\n# CODING CONVENTIONS\n{conventions_file.read_text()}")
+            conventions_text = self._read_static(self.contexts_dir / "conventions.txt", compact, patterns)
+            if conventions_text is not None:
+                sections.append(("\n# CODING CONVENTIONS", conventions_text))
         
         # Load current template if set
-        if self.current_template:
-            template_content = self.load_template(self.current_template)
+        if self.current_template and self.load_template(self.current_template):
+            template_content = self._read_static(self._template_path(), compact, patterns)
             if template_content:
-                context_parts.append(f"\n# TEMPLATE: {self.current_template}\n{template_content}")
+                sections.append((f"\n# TEMPLATE: {self.current_template}", template_content))
+        
+        if compact:
+            texts = dedupe_bullets([text for _, text in sections])
+            sections = [(heading.lstrip("\n"), text) for (heading, _), text in zip(sections, texts)]
+            # A file that starts with its own "# ..." title doesn't need ours as well
+            for i, (heading, text) in enumerate(sections):
+                first, _, rest = text.partition("\n")
+                if first.startswith("# "):
+                    sections[i] = (first, rest.lstrip("\n"))
         
+        context_parts = [f"{heading}\n{text}" for heading, text in sections]
         return "\n".join(context_parts)
     
+    def set_tokenizer(self, tokenizer: Callable[..., List[int]], n_ctx: Optional[int] = None,
+                      vocab: Optional[str] = None):
+        """
+        Use the model's tokenizer for budgeting and token-level prompts
+        
+        The callable takes (text, add_bos=False) and returns token IDs,
+        e.g. OrbitModel.tokenize. Existing history is re-encoded once.
+        n_ctx is the model's resolved context size (OrbitModel.context_size),
+        needed when config.yaml sets `n_ctx: auto`. vocab names the model
+        the tokenizer belongs to, so context managers sharing a FileCache
+        share its memoized system IDs instead of overwriting each other's.
+        """
+        self.tokenizer = tokenizer
+        self.vocab = vocab
+        if n_ctx is not None:
+            self.n_ctx = n_ctx
+        self._vocab_version += 1
+        self._header_ids = None
+        self._summary_ids = None
+        self._history_tokens = 0
+        for msg in self.conversation_history:
+            msg['ids'] = self.encode(self.format_message(msg['role'], msg['content']))
+            msg['tokens'] = self._segment_length(msg['ids'], msg['content'])
+            self._history_tokens += msg['tokens']
+    
+    def encode(self, text: str, add_bos: bool = False) -> Optional[List[int]]:
+        """Tokenize text with the model tokenizer, or return None without one"""
+        if self.tokenizer is None:
+            return None
+        return self.tokenizer(text, add_bos=add_bos)
+    
+    def count_tokens(self, text: str) -> int:
+        """Count tokens with the model tokenizer, or estimate ~4 chars/token without one"""
+        return self._segment_length(self.encode(text), text)
+    
+    @staticmethod
+    def _segment_length(ids: Optional[List[int]], text: str) -> int:
+        """Token count of a segment, estimated from its text when not tokenized"""
+        if ids is not None:
+            return len(ids)
+        return len(text) // 4 + 1
+    
+    @staticmethod
+    def format_message(role: str, content: str) -> str:
+        """Format one ChatML turn"""
+        return f"<|im_start|>{role}\n{content}<|im_end|>\n"
+    
+    def history_budget(self, extra_tokens: int = 0) -> int:
+        """Tokens available to history: n_ctx minus static context and response reserve"""
+        reserve = self.config['generation']['max_tokens']
+        return self._context_window() - self._static_tokens - self._summary_tokens() - reserve - extra_tokens
+    
+    def _context_window(self) -> int:
+        """n_ctx, with `auto` resolved by the model (see set_tokenizer)"""
+        n_ctx = self.config['performance']['n_ctx']
+        if n_ctx == 'auto':
+            n_ctx = self.n_ctx or AUTO_N_CTX_MIN
+        return n_ctx
+    
+    def _overflow(self, max_messages: int, budget: int) -> int:
+        """How many of the oldest messages must go for history to fit the limits"""
+        history = self.conversation_history
+        count, tokens = 0, self._history_tokens
+        while count < len(history) and (tokens > budget or len(history) - count > max_messages):
+            tokens -= history[count]['tokens']
+            count += 1
+            # Never start the window on an orphaned assistant reply
+            if count < len(history) and history[count]['role'] == 'assistant':
+                tokens -= history[count]['tokens']
+                count += 1
+        return count
+    
+    def _trim_history(self, extra_tokens: int = 0):
+        """Drop the oldest messages until history fits the token budget and max_history"""
+        max_messages = self.config['context']['max_history'] * 2  # *2 for user+assistant pairs
+        count = self._overflow(max_messages, self.history_budget(extra_tokens))
+        if not count:
+            return
+        dropped = self.conversation_history[:count]
+        del self.conversation_history[:count]
+        self._history_tokens -= sum(msg['tokens'] for msg in dropped)
+        if self.config['context'].get('summarize', False):
+            # Kept for the next idle-time summary, within the same message cap
+            self._evicted = (self._evicted + dropped)[-max_messages:]
+    
     def add_to_history(self, role: str, content: str):
-        """Add message to conversation history"""
-        self.conversation_history.append({"role": role, "content": content})
+        """Add message to conversation history
+        
+        Each message is tokenized once here and its token IDs are stored with
+        it, so later prompts and budget trimming never re-tokenize old turns.
+        """
+        if self._pending_message is not None and self._pending_message[:2] == (role, content):
+            ids = self._pending_message[2]
+        else:
+            ids = self.encode(self.format_message(role, content))
+        self._pending_message = None
+        
+        tokens = self._segment_length(ids, content)
+        self.conversation_history.append(
+            {"role": role, "content": content, "tokens": tokens, "ids": ids}
+        )
+        self._history_tokens += tokens
         
-        # Keep only recent history
-        max_history = self.config['context']['max_history']
-        if len(self.conversation_history) > max_history * 2:  # *2 for user+assistant pairs
-            self.conversation_history = self.conversation_history[-(max_history * 2):]
+        # Keep only recent history that fits in the context window
+        self._trim_history()
     
-    def build_prompt(self, user_message: str, override_project_context: bool = False) -> str:
+    def _summary_segment(self) -> tuple:
+        """The "conversation so far" block placed after the static context, and its token IDs"""
+        if not self.summary:
+            return "", []
+        block = self.format_message("system", f"# CONVERSATION SO FAR\n{self.summary}")
+        if self._summary_ids is None:
+            self._summary_ids = self.encode(block)
+        return block, self._summary_ids
+    
+    def _summary_tokens(self) -> int:
+        block, ids = self._summary_segment()
+        return self._segment_length(ids, block) if block else 0
+    
+    def summary_candidates(self) -> List[Dict]:
+        """
+        Messages to fold into the summary now (context.summarize)
+        
+        These are turns already evicted plus the oldest turns that would be
+        evicted next: those beyond max_history minus one exchange, or beyond
+        75% of the token budget.
+        """
+        if not self.config['context'].get('summarize', False):
+            return []
+        max_messages = self.config['context']['max_history'] * 2 - 2
+        count = self._overflow(max_messages, int(self.history_budget() * 0.75))
+        return self._evicted + self.conversation_history[:count]
+    
+    def build_summary_prompt(self, messages: List[Dict], max_words: int) -> List[int]:
+        """
+        Token IDs of a request to fold messages into the summary
+        
+        Oldest history messages are laid out exactly as in the chat prompt,
+        so the evaluated KV state of the last request is reused.
+        """
+        if self.tokenizer is None:
+            raise RuntimeError("build_summary_prompt needs a tokenizer - call set_tokenizer() first")
+        if self._header_ids is None:
+            self._header_ids = self.encode(ASSISTANT_HEADER)
+        
+        tokens = list(self._system_segment(False)[1]) + list(self._summary_segment()[1])
+        for msg in messages:
+            tokens.extend(msg['ids'] or self.encode(self.format_message(msg['role'], msg['content'])))
+        earlier = " and the earlier summary" if self.summary else ""
+        tokens.extend(self.encode(self.format_message("user", (
+            f"Summarize the conversation above{earlier} in at most {max_words} words, as notes for "
+            f"continuing it later: requirements, decisions, names of files, functions and APIs, "
+            f"and open questions. Do not include code listings."
+        ))))
+        tokens.extend(self._header_ids)
+        return tokens
+    
+    def apply_summary(self, summary: str, messages: List[Dict]):
+        """Replace the summary with one that covers messages, and drop them"""
+        folded = {id(msg) for msg in messages}
+        self._evicted = [msg for msg in self._evicted if id(msg) not in folded]
+        self.conversation_history = [msg for msg in self.conversation_history if id(msg) not in folded]
+        self._history_tokens = sum(msg['tokens'] for msg in self.conversation_history)
+        self.summary = summary
+        self._summary_ids = None
+    
+    def _vocab_identity(self) -> tuple:
+        """What the memoized system IDs depend on besides the text"""
+        if self.vocab is None:
+            return (self.tokenizer, self._vocab_version)  # Unnamed tokenizer: only trust this instance's entries
+        return (self.vocab, model_path(self.config, self.vocab))
+    
+    def _system_segment(self, override_project_context: bool) -> tuple:
+        """Return the ChatML system block and its (cached) token IDs"""
+        # Load static context (project rules, conventions)
+        static_context = self.load_context_files(override_project_context)
+        system_block = self.format_message("system", static_context)
+        system_ids = self.file_cache.memo(
+            ('system_ids', override_project_context, self.current_template, self.vocab),
+            (system_block, self._vocab_identity()),
+            lambda: self.encode(system_block, add_bos=True),
+        )
+        return system_block, system_ids
+    
+    def build_system_tokens(self, override_project_context: bool = False) -> List[int]:
+        """Token IDs of the static system block alone, e.g. for warming its KV state"""
+        if self.tokenizer is None:
+            raise RuntimeError("build_system_tokens needs a tokenizer - call set_tokenizer() first")
+        self._reencode_if_vocab_changed()
+        return list(self._system_segment(override_project_context)[1])
+    
+    def _retrieve(self, user_message: str) -> str:
+        """
+        Render the code chunks most relevant to user_message, within the token budget
+        
+        Chunks come best first; one that doesn't fit is skipped so a smaller,
+        lower-ranked chunk can still use the remaining budget.
+        """
+        self.last_retrieval = {"chunks": 0, "tokens": 0}
+        if self.code_index is None:
+            return ""
+        
+        retrieval_config = self.config['retrieval']
+        budget = retrieval_config.get('max_tokens', 1500)
+        parts, used = [], 0
+        for chunk in self.code_index.search(user_message, retrieval_config.get('top_k', 5)):
+            text = f"## {chunk['path']} (lines {chunk['start']}-{chunk['end']})\n```\n{chunk['text']}\n```\n"
+            tokens = self.count_tokens(text)
+            if used + tokens > budget:
+                continue
+            parts.append(text)
+            used += tokens
+        
+        if not parts:
+            return ""
+        self.last_retrieval = {"chunks": len(parts), "tokens": used}
+        return "# RELEVANT CODE\n" + "\n".join(parts) + "\n# REQUEST\n"
+    
+    def _prepare_turn(self, user_message: str, override_project_context: bool, attachment: str = "") -> tuple:
+        """
+        Render and tokenize the static and new parts of the next prompt
+        
+        The system block's token IDs are cached per static-context version and
+        the user message is tokenized once (add_to_history reuses it), then
+        history is trimmed to make room for both. Retrieved code goes into
+        this user turn only - not the system block, whose KV state is cached,
+        and not history, which keeps just the message. So does attachment
+        (e.g. files attached for /edit).
+        
+        Returns:
+            (system_block, system_ids, user_block, user_ids)
+        """
+        self._reencode_if_vocab_changed()
+        system_block, system_ids = self._system_segment(override_project_context)
+        self._static_tokens = self._segment_length(system_ids, system_block)
+        
+        # Make room for the new message
+        extra = attachment + self._retrieve(user_message)
+        user_block = self.format_message("user", extra + user_message)
+        user_ids = self.encode(user_block)
+        self._pending_message = None if extra else ("user", user_message, user_ids)
+        message_tokens = self._segment_length(user_ids, user_block)
+        self._trim_history(extra_tokens=message_tokens)
+        if self.history_budget(message_tokens) <= 0:
+            # History is gone and the prompt still overflows - say so instead of failing obscurely
+            print(
+                f"⚠️  The prompt doesn't fit n_ctx {self._context_window()}: static context "
+                f"{self._static_tokens} + summary {self._summary_tokens()} + message {message_tokens} + "
+                f"max_tokens {self.config['generation']['max_tokens']} tokens leave no room for history. "
+                f"Raise n_ctx, lower generation.max_tokens or shorten the context files (context.compact helps)."
+            )
+        
+        return system_block, system_ids, user_block, user_ids
+    
+    def build_prompt(self, user_message: str, override_project_context: bool = False, attachment: str = "") -> str:
         """
         Build complete prompt with context + history + new message
         
         Args:
             user_message: The user's input message
             override_project_context: If True, skip project context for this request
+            attachment: Text placed before the message in this turn only
         
         Format: Qwen2.5 ChatML style
         """
-        # Load static context (project rules, conventions)
-        static_context = self.load_context_files(override_project_context)
+        system_block, _, user_block, _ = self._prepare_turn(user_message, override_project_context, attachment)
+        
+        # System context, conversation summary, history, the new message, then the assistant header
+        parts = [system_block, self._summary_segment()[0]]
+        parts.extend(self.format_message(msg['role'], msg['content']) for msg in self.conversation_history)
+        parts.append(user_block)
+        parts.append(ASSISTANT_HEADER)
+        
+        return "".join(parts)
+    
+    def build_prompt_tokens(self, user_message: str, override_project_context: bool = False,
+                            attachment: str = "") -> List[int]:
+        """
+        Build the same prompt as build_prompt, directly as token IDs
+        
+        Every segment (system block, each history turn, assistant header) is
+        cached as token IDs, so only the new user message is tokenized and the
+        model skips re-tokenizing the whole conversation. Requires a tokenizer
+        (see set_tokenizer).
+        """
+        if self.tokenizer is None:
+            raise RuntimeError("build_prompt_tokens needs a tokenizer - call set_tokenizer() first")
         
-        # Start with system message including context
-        prompt = f"<|im_start|>system\n{static_context}<|im_end|>\n"
+        _, system_ids, _, user_ids = self._prepare_turn(user_message, override_project_context, attachment)
+        if self._header_ids is None:
+            self._header_ids = self.encode(ASSISTANT_HEADER)
         
-        # Add conversation history
+        tokens = list(system_ids) + list(self._summary_segment()[1])
         for msg in self.conversation_history:
-            prompt += f"<|im_start|>{msg['role']}\n{msg['content']}<|im_end|>\n"
+            tokens.extend(msg['ids'])
+        tokens.extend(user_ids)
+        tokens.extend(self._header_ids)
         
-        # Add current user message
-        prompt += f"<|im_start|>user\n{user_message}<|im_end|>\n"
+        return tokens
+    
+    def build_prefix_tokens(self, override_project_context: bool = False) -> List[int]:
+        """
+        Token IDs the next prompt will start with, before the message is known
         
-        # Prepare for assistant response
-        prompt += "<|im_start|>assistant\n"
+        That is the system block, summary, history and the user turn header;
+        evaluating them while the user types (OrbitModel.prefill) leaves only
+        the message itself for after Enter.
+        """
+        if self.tokenizer is None:
+            raise RuntimeError("build_prefix_tokens needs a tokenizer - call set_tokenizer() first")
+        self._reencode_if_vocab_changed()
         
-        return prompt
+        tokens = list(self._system_segment(override_project_context)[1]) + list(self._summary_segment()[1])
+        for msg in self.conversation_history:
+            tokens.extend(msg['ids'])
+        tokens.extend(self.encode(USER_HEADER))
+        return tokens
+    
+    def load_history(self, messages: List[Dict], reencode: bool = False, summary: str = ""):
+        """
+        Replace the history with saved messages (see add_to_history for the format)
+        
+        Stored token IDs are reused unless reencode is set, e.g. because the
+        session was saved with a different model. summary restores the
+        "conversation so far" block.
+        """
+        self.conversation_history = list(messages)
+        self._pending_message = None
+        self.summary = summary
+        self._summary_ids = None
+        self._evicted = []
+        if self.tokenizer is not None and (reencode or any(msg.get('ids') is None for msg in messages)):
+            self.set_tokenizer(self.tokenizer, vocab=self.vocab)
+        else:
+            self._history_tokens = sum(msg['tokens'] for msg in messages)
+        self._trim_history()
     
     def clear_history(self):
         """Clear conversation history"""
         self.conversation_history.clear()
+        self._history_tokens = 0
+        self.summary = ""
+        self._summary_ids = None
+        self._evicted = []
+    
+    def static_tokens(self, override_project_context: bool = False) -> dict:
+        """Token counts of the static context as written and after compaction"""
+        return {
+            "enabled": self.config['context'].get('compact', False),
+            "raw": self.count_tokens(self.load_context_files(override_project_context, compact=False)),
+            "compacted": self.count_tokens(self.load_context_files(override_project_context, compact=True)),
+        }
     
     def get_context_info(self) -> dict:
         """Get info about loaded contexts"""
@@ -125,4 +552,11 @@ class ContextManager:
             "project": (self.contexts_dir / "project.txt").exists(),
             "conventions": (self.contexts_dir / "conventions.txt").exists(),
             "history_length": len(self.conversation_history),
+            "history_tokens": self._history_tokens,
+            "history_budget": self.history_budget(),
+            "summary_tokens": self._summary_tokens(),
+            "unsummarized": len(self._evicted),
+            "cache": self.file_cache.stats(),
+            "retrieval": self.code_index.stats() if self.code_index is not None else None,
+            "last_retrieval": self.last_retrieval,
         }
@@ -0,0 +1,316 @@
+"""Edit mode: ask for unified diffs, parse them while they stream, apply locally"""
+import difflib
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+EDIT_INSTRUCTIONS = (
+    "# EDIT FORMAT\n"
+    "Reply with the changes as a unified diff against the files above, in a ```diff block "
+    "(--- a/<path>, +++ b/<path>, @@ hunks with 3 lines of context). "
+    "Do not repeat unchanged code. After the diff, briefly explain the changes.\n"
+)
+
+FULL_OUTPUT_INSTRUCTIONS = (
+    "# OUTPUT FORMAT\n"
+    "Reply with the complete updated content of each changed file, each under a "
+    "'## <path>' heading in its own code block.\n"
+)
+
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class PatchError(Exception):
+    """A diff that doesn't parse or doesn't match the attached files"""
+
+
+@dataclass
+class Hunk:
+    old_start: int
+    lines: List[str] = field(default_factory=list)  # Each starts with ' ', '-' or '+'
+
+    @property
+    def old_lines(self) -> List[str]:
+        return [line[1:] for line in self.lines if line[0] in ' -']
+
+    @property
+    def new_lines(self) -> List[str]:
+        return [line[1:] for line in self.lines if line[0] in ' +']
+
+
+@dataclass
+class FilePatch:
+    old_path: str
+    new_path: str
+    hunks: List[Hunk] = field(default_factory=list)
+
+    @property
+    def path(self) -> str:
+        return self.old_path if self.new_path == "/dev/null" else self.new_path
+
+    @property
+    def is_new(self) -> bool:
+        return self.old_path == "/dev/null"
+
+
+def _strip_path(raw: str) -> str:
+    """'a/src/x.py\t2024-...' -> 'src/x.py'"""
+    path = raw.split('\t')[0].strip()
+    if path != "/dev/null" and path[:2] in ("a/", "b/"):
+        path = path[2:]
+    return path
+
+
+class DiffStreamParser:
+    """
+    Incremental unified-diff parser fed with streamed text
+
+    Complete lines are parsed as they arrive; on_file is called with each
+    FilePatch as soon as it is finished (the next file starts or the diff
+    ends), so it can be validated while the model is still generating.
+    Prose and code fences around the diff are ignored.
+    """
+
+    def __init__(self, on_file: Optional[Callable[[FilePatch], None]] = None):
+        self.on_file = on_file
+        self.patches: List[FilePatch] = []
+        self._partial = ""
+        self._current: Optional[FilePatch] = None
+        self._pending_old: Optional[str] = None
+        self._old_left = 0  # Lines the open hunk's header says are still to come
+        self._new_left = 0
+
+    def watch(self, tokens: Iterable[str]) -> Iterator[str]:
+        """Pass tokens through unchanged while feeding them to the parser"""
+        for token in tokens:
+            self.feed(token)
+            yield token
+        self.finish()
+
+    def feed(self, text: str):
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._line(line)
+
+    def finish(self) -> List[FilePatch]:
+        """Flush the last line and file; returns all patches"""
+        if self._partial:
+            self._line(self._partial)
+            self._partial = ""
+        self._close_file()
+        return self.patches
+
+    def _line(self, line: str):
+        line = line.rstrip("\r")
+        if (self._old_left > 0 or self._new_left > 0) and (line[:1] in (' ', '-', '+') or line == ""):
+            # Still inside the hunk by its counts: "--- x" here is a removed "-- x" line, not a header
+            self._hunk_line(line)
+            return
+        if line.startswith("--- "):
+            self._close_file()
+            self._pending_old = _strip_path(line[4:])
+            return
+        if line.startswith("+++ ") and self._pending_old is not None:
+            self._current = FilePatch(self._pending_old, _strip_path(line[4:]))
+            self._pending_old = None
+            return
+        self._pending_old = None
+        if self._current is None:
+            return
+
+        match = _HUNK_RE.match(line)
+        if match:
+            self._current.hunks.append(Hunk(old_start=int(match.group(1))))
+            self._old_left = int(match.group(2) or 1)
+            self._new_left = int(match.group(4) or 1)
+        elif self._current.hunks and (line[:1] in (' ', '-', '+') or line == ""):
+            self._hunk_line(line)  # Past the stated counts: models often miscount, keep going
+        elif line.startswith("\\"):
+            pass  # "\ No newline at end of file"
+        else:
+            self._close_file()  # Fence or prose: the diff is over
+
+    def _hunk_line(self, line: str):
+        line = line or " "  # Models often drop the space on empty context lines
+        self._current.hunks[-1].lines.append(line)
+        if line[0] in ' -':
+            self._old_left -= 1
+        if line[0] in ' +':
+            self._new_left -= 1
+
+    def _close_file(self):
+        self._old_left = self._new_left = 0
+        if self._current is None:
+            return
+        patch, self._current = self._current, None
+        for hunk in patch.hunks:
+            while hunk.lines and hunk.lines[-1] == " ":
+                hunk.lines.pop()  # Blank lines after the diff, not context
+        patch.hunks = [hunk for hunk in patch.hunks if hunk.lines]
+        if not patch.hunks:
+            return
+        self.patches.append(patch)
+        if self.on_file is not None:
+            self.on_file(patch)
+
+
+def _find(lines: List[str], block: List[str], near: int, start: int) -> int:
+    """Index of block in lines at or after start, closest to near (whitespace-tolerant)"""
+    wanted = [line.rstrip() for line in block]
+    stripped = [line.rstrip() for line in lines]
+    candidates = [
+        i for i in range(start, len(lines) - len(block) + 1)
+        if stripped[i:i + len(block)] == wanted
+    ]
+    if not candidates:
+        raise PatchError("hunk context doesn't match the file:\n  " + "\n  ".join(block[:3]))
+    return min(candidates, key=lambda i: abs(i - near))
+
+
+def apply_patch(original: Optional[str], patch: FilePatch) -> str:
+    """
+    Apply one file's hunks to its original text
+
+    Hunks are located by their context and removed lines, so wrong line
+    numbers (common in model output) are tolerated; the stated position
+    only breaks ties.
+    """
+    if patch.new_path == "/dev/null":
+        raise PatchError(f"{patch.path}: deleting files isn't supported")
+    if patch.is_new:
+        return "\n".join(line for hunk in patch.hunks for line in hunk.new_lines) + "\n"
+    if original is None:
+        raise PatchError(f"{patch.path} isn't an attached file")
+
+    lines = original.split("\n")
+    position = 0
+    for hunk in patch.hunks:
+        if not any(line[0] in '-+' for line in hunk.lines):
+            raise PatchError(f"{patch.path}: hunk at line {hunk.old_start} changes nothing")
+        old = hunk.old_lines
+        if old:
+            index = _find(lines, old, near=hunk.old_start - 1, start=position)
+        else:
+            index = min(max(hunk.old_start, 0), len(lines))
+        lines[index:index + len(old)] = hunk.new_lines
+        position = index + len(hunk.new_lines)
+    return "\n".join(lines)
+
+
+def unified_diff(path: str, before: str, after: str) -> str:
+    """A clean diff of the applied change, for display"""
+    return "".join(difflib.unified_diff(
+        before.splitlines(keepends=True),
+        after.splitlines(keepends=True),
+        fromfile=f"a/{path}",
+        tofile=f"b/{path}",
+    ))
+
+
+class EditSession:
+    """
+    Files attached with /edit, and the patches proposed for them
+
+    Proposed changes are kept in `pending` (path -> new content) until
+    written with write_pending().
+    """
+
+    def __init__(self, root: str = "."):
+        self.root = Path(root)
+        self.files: List[str] = []
+        self.pending: Dict[str, str] = {}
+
+    @property
+    def active(self) -> bool:
+        return bool(self.files)
+
+    def attach(self, paths: List[str]) -> List[str]:
+        """Attach existing files; returns the ones that don't exist"""
+        missing = [p for p in paths if not (self.root / p).is_file()]
+        for path in paths:
+            if path not in missing and path not in self.files:
+                self.files.append(path)
+        return missing
+
+    def detach(self):
+        self.files.clear()
+        self.pending.clear()
+
+    def read(self, path: str) -> str:
+        """Current content: a pending patch if there is one, else the file on disk"""
+        if path in self.pending:
+            return self.pending[path]
+        return (self.root / path).read_text(encoding='utf-8')
+
+    def resolve(self, diff_path: str) -> Optional[str]:
+        """Map a path from a diff to an attached file (exact, then unique suffix match)"""
+        if diff_path in self.files:
+            return diff_path
+        matches = [f for f in self.files if f.endswith("/" + diff_path) or diff_path.endswith("/" + f)]
+        return matches[0] if len(matches) == 1 else None
+
+    def project_path(self, path: str) -> str:
+        """path relative to the project root, rejecting anything that points outside it"""
+        root = self.root.resolve()
+        try:
+            relative = (root / path).resolve().relative_to(root)
+        except ValueError:
+            raise PatchError(f"{path} is outside the project")
+        if relative == Path("."):
+            raise PatchError(f"{path} isn't a file path")
+        return relative.as_posix()
+
+    def prompt_prefix(self, full_output: bool = False) -> str:
+        """Attached files plus the output-format instructions, placed before the request"""
+        parts = ["# FILES"]
+        for path in self.files:
+            parts.append(f"## {path}\n```\n{self.read(path)}\n```")
+        parts.append(FULL_OUTPUT_INSTRUCTIONS if full_output else EDIT_INSTRUCTIONS)
+        return "\n".join(parts) + "\n"
+
+    def apply(self, patch: FilePatch) -> Tuple[str, str]:
+        """
+        Validate one file's patch and stage the result
+
+        Returns:
+            (attached path, diff of the staged change for display)
+        """
+        path = self.project_path(patch.path) if patch.is_new else self.resolve(patch.path)
+        if path is None:
+            raise PatchError(f"{patch.path} isn't an attached file")
+        before = "" if patch.is_new else self.read(path)
+        after = apply_patch(None if patch.is_new else before, patch)
+        self.pending[path] = after
+        return path, unified_diff(path, before, after)
+
+    def apply_full_output(self, response: str) -> List[str]:
+        """Stage complete files from a full-output answer ('## path' + code block); returns paths"""
+        staged = []
+        for match in re.finditer(r"^##\s+(\S+)\s*\n```[^\n]*\n(.*?)\n```", response, re.M | re.S):
+            path = self.resolve(match.group(1))
+            if path is not None:
+                self.pending[path] = match.group(2) + "\n"
+                staged.append(path)
+        if not staged and len(self.files) == 1:
+            blocks = re.findall(r"```[^\n]*\n(.*?)\n```", response, re.S)
+            if blocks:
+                self.pending[self.files[0]] = max(blocks, key=len) + "\n"
+                staged.append(self.files[0])
+        return staged
+
+    def write_pending(self) -> List[str]:
+        """Write staged changes to disk; returns the written paths"""
+        targets = {path: self.root / self.project_path(path) for path in self.pending}  # Check all before writing any
+        written = []
+        for path, content in self.pending.items():
+            target = targets[path]
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(content, encoding='utf-8')
+            if path not in self.files:
+                self.files.append(path)
+            written.append(path)
+        self.pending.clear()
+        return written
@@ -0,0 +1,69 @@
+"""mtime-aware in-memory cache for Orbit's context and template files"""
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+# (mtime_ns, size) of a file, or None when it doesn't exist
+Signature = Optional[Tuple[int, int]]
+
+
+def file_signature(path: Path) -> Signature:
+    """Return a cheap change-detection signature for path"""
+    try:
+        stat = path.stat()
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class FileCache:
+    """
+    Keeps file contents, directory listings and derived values in memory
+
+    Entries are re-read only when the file's mtime or size changes, so a
+    lookup on an unchanged file costs one stat() call.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, Tuple[Any, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key: Hashable, signature: Any, build: Callable[[], Any]) -> Any:
+        """Return the cached value for key, rebuilding it if signature changed"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == signature:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        value = build()
+        self._entries[key] = (signature, value)
+        return value
+
+    def read_text(self, path: Path) -> Optional[str]:
+        """Return file contents, or None if the file doesn't exist"""
+        signature = file_signature(path)
+        if signature is None:
+            self._entries.pop(('file', path), None)
+            return None
+        return self._lookup(('file', path), signature, path.read_text)
+
+    def glob(self, directory: Path, pattern: str) -> List[Path]:
+        """Return sorted glob results, re-scanning only when the directory changes"""
+        signature = file_signature(directory)
+        if signature is None:
+            return []
+        return self._lookup(
+            ('glob', directory, pattern),
+            signature,
+            lambda: sorted(directory.glob(pattern)),
+        )
+
+    def memo(self, key: Hashable, signature: Any, build: Callable[[], Any]) -> Any:
+        """Cache a value derived from files, keyed by their combined signature"""
+        return self._lookup(('memo', key), signature, build)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters"""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
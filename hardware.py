@@ -0,0 +1,74 @@
+"""Host hardware detection: physical cores, NUMA nodes, RAM and GPU offload"""
+import os
+import platform
+from pathlib import Path
+from typing import Optional
+
+
+def physical_cores() -> int:
+    """Physical CPU cores (hyperthreads don't speed up llama.cpp matmuls)"""
+    try:
+        cores = set()
+        physical_id = core_id = None
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                key = key.strip()
+                if key == "physical id":
+                    physical_id = value.strip()
+                elif key == "core id":
+                    core_id = value.strip()
+                elif not key and core_id is not None:
+                    cores.add((physical_id, core_id))
+                    physical_id = core_id = None
+        if core_id is not None:
+            cores.add((physical_id, core_id))
+        if cores:
+            return len(cores)
+    except OSError:
+        pass
+    return os.cpu_count() or 1
+
+
+def numa_nodes() -> int:
+    """Number of NUMA nodes (1 when not reported)"""
+    nodes = list(Path("/sys/devices/system/node").glob("node[0-9]*"))
+    return len(nodes) or 1
+
+
+def available_ram_mb() -> Optional[int]:
+    """RAM available to new allocations, in MiB (None if unknown)"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def gpu_offload_supported() -> bool:
+    """True if the installed llama.cpp build can offload layers to a GPU"""
+    try:
+        import llama_cpp
+        return bool(llama_cpp.llama_supports_gpu_offload())
+    except Exception:
+        return False
+
+
+def host_id() -> str:
+    """Identifies this machine in saved tuning profiles"""
+    return f"{platform.node()}-{platform.machine()}-{physical_cores()}c"
+
+
+def describe() -> dict:
+    """Everything detected, for display and for the tuning profile"""
+    return {
+        "host": host_id(),
+        "physical_cores": physical_cores(),
+        "logical_cpus": os.cpu_count(),
+        "numa_nodes": numa_nodes(),
+        "available_ram_mb": available_ram_mb(),
+        "gpu_offload": gpu_offload_supported(),
+    }
@@ -0,0 +1,220 @@
+"""Memory planning: GGUF model dimensions, KV-cache sizing and auto n_ctx"""
+import struct
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+
+# KV cache element types: name -> (ggml type id, bytes per element)
+KV_TYPES = {
+    "f32": (0, 4.0),
+    "f16": (1, 2.0),
+    "bf16": (30, 2.0),
+    "q8_0": (8, 34 / 32),
+    "q5_1": (7, 24 / 32),
+    "q5_0": (6, 22 / 32),
+    "q4_1": (3, 20 / 32),
+    "q4_0": (2, 18 / 32),
+    "iq4_nl": (20, 18 / 32),
+}
+
+AUTO_N_CTX_MIN = 1024
+AUTO_N_CTX_MAX = 32768
+AUTO_N_CTX_STEP = 1024  # Coarse steps, so RAM jitter doesn't change n_ctx (and invalidate caches) every run
+
+# GGUF value types: id -> struct format (8 = string, 9 = array)
+_GGUF_SCALARS = {0: "<B", 1: "<b", 2: "<H", 3: "<h", 4: "<I", 5: "<i", 6: "<f", 7: "<?", 10: "<Q", 11: "<q", 12: "<d"}
+_GGUF_STRING, _GGUF_ARRAY = 8, 9
+
+
+def kv_type(name: str) -> int:
+    """ggml type id for a KV cache type name"""
+    if name not in KV_TYPES:
+        raise ValueError(f"Unknown KV cache type: {name} (use one of {', '.join(KV_TYPES)})")
+    return KV_TYPES[name][0]
+
+
+def read_gguf_metadata(path: str, keys: Iterable[str]) -> Dict[str, object]:
+    """
+    Read selected key/value pairs from a GGUF file header
+
+    Stops as soon as all keys are found, so the tensor data is never read.
+    Array values are returned as their length (e.g. the vocabulary size).
+    """
+    wanted = set(keys)
+    found: Dict[str, object] = {}
+    with open(path, 'rb') as f:
+        def read(fmt: str):
+            return struct.unpack(fmt, f.read(struct.calcsize(fmt)))[0]
+
+        def read_string() -> bytes:
+            return f.read(read("<Q"))
+
+        def read_value(value_type: int):
+            if value_type in _GGUF_SCALARS:
+                return read(_GGUF_SCALARS[value_type])
+            if value_type == _GGUF_STRING:
+                return read_string().decode('utf-8', errors='replace')
+            if value_type == _GGUF_ARRAY:
+                item_type, count = read("<I"), read("<Q")
+                if item_type in _GGUF_SCALARS:
+                    f.seek(count * struct.calcsize(_GGUF_SCALARS[item_type]), 1)
+                else:
+                    for _ in range(count):
+                        read_value(item_type)
+                return count
+            raise ValueError(f"{path}: unknown GGUF value type {value_type}")
+
+        if f.read(4) != b"GGUF":
+            raise ValueError(f"{path} is not a GGUF file")
+        if read("<I") < 2:
+            raise ValueError(f"{path}: GGUF v1 is not supported")
+        read("<Q")  # Tensor count
+        for _ in range(read("<Q")):
+            key = read_string().decode('utf-8', errors='replace')
+            value = read_value(read("<I"))
+            if key in wanted:
+                found[key] = value
+                if len(found) == len(wanted):
+                    break
+    return found
+
+
+@dataclass
+class ModelShape:
+    """The dimensions that size a model's KV cache and compute buffers"""
+    n_layer: int
+    n_head: int
+    n_head_kv: int
+    n_embd: int
+    n_vocab: int
+    n_ctx_train: int
+    key_length: int
+    value_length: int
+
+    def kv_bytes_per_token(self, type_k: str = "f16", type_v: str = "f16") -> float:
+        """K and V cache bytes for one token across all layers"""
+        per_layer = self.n_head_kv * (
+            self.key_length * KV_TYPES[type_k][1] + self.value_length * KV_TYPES[type_v][1]
+        )
+        return self.n_layer * per_layer
+
+
+def model_shape(path: str) -> Optional[ModelShape]:
+    """Read a GGUF model's dimensions (None if the file can't be read or lacks them)"""
+    try:
+        arch = read_gguf_metadata(path, ["general.architecture"])["general.architecture"]
+        names = {
+            "n_layer": f"{arch}.block_count",
+            "n_head": f"{arch}.attention.head_count",
+            "n_head_kv": f"{arch}.attention.head_count_kv",
+            "n_embd": f"{arch}.embedding_length",
+            "n_vocab": "tokenizer.ggml.tokens",
+            "n_ctx_train": f"{arch}.context_length",
+            "key_length": f"{arch}.attention.key_length",
+            "value_length": f"{arch}.attention.value_length",
+        }
+        meta = read_gguf_metadata(path, names.values())
+        n_head = meta[names["n_head"]]
+        head_dim = meta[names["n_embd"]] // n_head
+        return ModelShape(
+            n_layer=meta[names["n_layer"]],
+            n_head=n_head,
+            n_head_kv=meta.get(names["n_head_kv"], n_head),
+            n_embd=meta[names["n_embd"]],
+            n_vocab=meta.get(names["n_vocab"], 32000),
+            n_ctx_train=meta.get(names["n_ctx_train"], AUTO_N_CTX_MAX),
+            key_length=meta.get(names["key_length"], head_dim),
+            value_length=meta.get(names["value_length"], head_dim),
+        )
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+
+@dataclass
+class MemoryEstimate:
+    """Bytes needed to run a model, split by what they hold"""
+    weights: int
+    kv: int
+    scratch: int
+    logits: int = 0  # logits_all score buffer (speculative decoding), a numpy array in RAM
+
+    @property
+    def total(self) -> int:
+        return self.weights + self.kv + self.scratch + self.logits
+
+    def in_ram(self, ram_share: float = 1.0) -> int:
+        """Bytes in system RAM when only ram_share of the layers (and their KV) stay on the CPU"""
+        return int((self.weights + self.kv) * ram_share) + self.scratch + self.logits
+
+    def __add__(self, other: "MemoryEstimate") -> "MemoryEstimate":
+        """Combined estimate, e.g. a main model plus its speculative draft model"""
+        return MemoryEstimate(
+            self.weights + other.weights,
+            self.kv + other.kv,
+            self.scratch + other.scratch,
+            self.logits + other.logits,
+        )
+
+
+def estimate(
+    weights_bytes: int,
+    shape: ModelShape,
+    n_ctx: int,
+    n_batch: int = 512,
+    type_k: str = "f16",
+    type_v: str = "f16",
+    flash_attn: bool = False,
+    logits_all: bool = False,
+    draft: Optional[Tuple[int, ModelShape]] = None,
+) -> MemoryEstimate:
+    """
+    Memory for weights, KV cache and compute scratch at a given context size
+
+    Scratch is a rough upper bound: per batch, the output logits and a few
+    activation rows, plus the attention score matrix unless flash attention
+    avoids materializing it. logits_all adds float scores for every
+    position; draft is a speculative draft model's (weights bytes, shape),
+    loaded with the same context settings.
+    """
+    scratch = 4 * n_batch * (shape.n_vocab + 4 * shape.n_embd)
+    if not flash_attn:
+        scratch += 4 * n_batch * shape.n_head * n_ctx
+    memory = MemoryEstimate(
+        weights=weights_bytes,
+        kv=int(shape.kv_bytes_per_token(type_k, type_v) * n_ctx),
+        scratch=scratch,
+        logits=4 * n_ctx * shape.n_vocab if logits_all else 0,
+    )
+    if draft is not None:
+        memory += estimate(draft[0], draft[1], n_ctx, n_batch, type_k, type_v, flash_attn)
+    return memory
+
+
+def auto_n_ctx(
+    available_bytes: int,
+    weights_bytes: int,
+    shape: ModelShape,
+    n_batch: int = 512,
+    type_k: str = "f16",
+    type_v: str = "f16",
+    flash_attn: bool = False,
+    ram_share: float = 1.0,
+    logits_all: bool = False,
+    draft: Optional[Tuple[int, ModelShape]] = None,
+) -> int:
+    """
+    Largest context (in AUTO_N_CTX_STEP steps) whose estimate fits available_bytes
+
+    ram_share is the share of layers kept in RAM; offloaded layers take
+    their weights and KV cache to the GPU. logits_all and draft are as for
+    estimate(). The result is capped by the
+    model's training context and AUTO_N_CTX_MAX, and never below
+    AUTO_N_CTX_MIN, even if that doesn't fit.
+    """
+    empty = estimate(weights_bytes, shape, 0, n_batch, type_k, type_v, flash_attn, logits_all, draft)
+    one = estimate(weights_bytes, shape, 1, n_batch, type_k, type_v, flash_attn, logits_all, draft)
+    fixed = empty.in_ram(ram_share)
+    per_token = one.in_ram(ram_share) - fixed
+    n_ctx = int((available_bytes - fixed) / per_token) if per_token > 0 else AUTO_N_CTX_MAX
+    n_ctx = n_ctx // AUTO_N_CTX_STEP * AUTO_N_CTX_STEP
+    return max(AUTO_N_CTX_MIN, min(n_ctx, shape.n_ctx_train, AUTO_N_CTX_MAX))
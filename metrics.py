@@ -0,0 +1,185 @@
+"""Per-generation performance metrics, rolling aggregates and local sinks"""
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+
+@dataclass
+class GenerationMetrics:
+    """Timing and token counts for one OrbitModel.generate call"""
+    model: str
+    prompt_tokens: int = 0
+    cached_tokens: int = 0          # Prompt tokens already in the live KV cache
+    restored_tokens: int = 0        # ...loaded from a prefix snapshot instead of evaluated
+    prefix_source: Optional[str] = None  # "live", "snapshot", "evaluated" or None
+    restore_s: float = 0.0          # Time spent restoring/evaluating the static prefix
+    ttft_s: float = 0.0             # Request start to first token
+    prefill_s: float = 0.0          # Evaluating the prompt (incl. an evaluated prefix) to first token
+    output_tokens: int = 0
+    decode_s: float = 0.0           # First token to last token
+    total_s: float = 0.0
+    stop_reason: Optional[str] = None
+    response_cached: bool = False   # Answered from the response cache
+    draft_tokens: int = 0           # Speculative tokens proposed
+    accepted_tokens: int = 0        # ...and accepted by the main model
+    edit_mode: bool = False         # /edit request answered with a diff
+    patch_applied: bool = False     # ...which applied cleanly
+    saved_tokens: int = 0           # Full-file tokens the diff avoided generating
+    timestamp: float = field(default_factory=time.time)
+
+    @property
+    def prefix_reused(self) -> bool:
+        """True if the static prefix didn't need evaluating"""
+        return self.prefix_source in ("live", "snapshot")
+
+    @property
+    def evaluated_tokens(self) -> int:
+        return self.prompt_tokens - self.cached_tokens - self.restored_tokens
+
+    @property
+    def prefill_tps(self) -> float:
+        return self.evaluated_tokens / self.prefill_s if self.prefill_s > 0 else 0.0
+
+    @property
+    def decode_tps(self) -> float:
+        if self.output_tokens < 2 or self.decode_s <= 0:
+            return 0.0
+        return (self.output_tokens - 1) / self.decode_s
+
+    @property
+    def acceptance_rate(self) -> float:
+        """Share of speculative draft tokens the main model accepted"""
+        return self.accepted_tokens / self.draft_tokens if self.draft_tokens else 0.0
+
+    def to_dict(self) -> dict:
+        record = asdict(self)
+        record.update(
+            prefix_reused=self.prefix_reused,
+            prefill_tps=self.prefill_tps,
+            decode_tps=self.decode_tps,
+            acceptance_rate=self.acceptance_rate,
+        )
+        return record
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of values (0 for an empty list)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class MetricsRecorder:
+    """
+    Keeps a rolling window of GenerationMetrics
+
+    Optionally appends every record to a JSON-lines file and rewrites a
+    Prometheus text-format file (for node_exporter's textfile collector).
+    """
+
+    SUMMARY_FIELDS = ["ttft_s", "prefill_s", "prefill_tps", "decode_tps", "total_s"]
+
+    def __init__(self, window: int = 200, jsonl_path: Optional[str] = None, prometheus_path: Optional[str] = None):
+        self._records: Deque[GenerationMetrics] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.total = 0
+        self.jsonl_path = Path(jsonl_path) if jsonl_path else None
+        self.prometheus_path = Path(prometheus_path) if prometheus_path else None
+
+    def record(self, metrics: GenerationMetrics):
+        """Add a record and update the sinks"""
+        with self._lock:
+            self._records.append(metrics)
+            self.total += 1
+            if self.jsonl_path:
+                self.jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.jsonl_path, 'a') as f:
+                    f.write(json.dumps(metrics.to_dict()) + "\n")
+            if self.prometheus_path:
+                self._write_prometheus()
+
+    def record_edit(self, metrics: GenerationMetrics, applied: bool, saved_tokens: int):
+        """Annotate an already recorded generation with its /edit outcome"""
+        with self._lock:
+            metrics.edit_mode = True
+            metrics.patch_applied = applied
+            metrics.saved_tokens = saved_tokens
+            if self.jsonl_path:
+                with open(self.jsonl_path, 'a') as f:
+                    f.write(json.dumps({
+                        "event": "edit",
+                        "timestamp": metrics.timestamp,
+                        "model": metrics.model,
+                        "output_tokens": metrics.output_tokens,
+                        "patch_applied": applied,
+                        "saved_tokens": saved_tokens,
+                    }) + "\n")
+
+    @staticmethod
+    def _samples(records: List[GenerationMetrics], name: str) -> List[float]:
+        """A field's values over the records; throughput only from requests that processed tokens"""
+        values = [getattr(r, name) for r in records]
+        if name.endswith("_tps"):
+            values = [v for v in values if v > 0]  # Cache hits and early cancels would read as 0 t/s
+        return values
+
+    def summary(self) -> Dict[str, object]:
+        """p50/p95 of the main timings over the window, plus counts"""
+        with self._lock:
+            records = list(self._records)
+        result: Dict[str, object] = {
+            "requests": self.total,
+            "window": len(records),
+            "prefix_reuse_rate": (
+                sum(r.prefix_reused for r in records) / len(records) if records else 0.0
+            ),
+            "response_cache_rate": (
+                sum(r.response_cached for r in records) / len(records) if records else 0.0
+            ),
+            "output_tokens": sum(r.output_tokens for r in records),
+            "draft_tokens": sum(r.draft_tokens for r in records),
+            "accepted_tokens": sum(r.accepted_tokens for r in records),
+            "edit_requests": sum(r.edit_mode for r in records),
+            "edits_applied": sum(r.patch_applied for r in records),
+            "saved_tokens": sum(r.saved_tokens for r in records),
+        }
+        result["acceptance_rate"] = (
+            result["accepted_tokens"] / result["draft_tokens"] if result["draft_tokens"] else 0.0
+        )
+        for name in self.SUMMARY_FIELDS:
+            values = self._samples(records, name)
+            result[name] = {"p50": percentile(values, 50), "p95": percentile(values, 95)}
+        return result
+
+    def _write_prometheus(self):
+        """Rewrite the Prometheus text file atomically (lock held)"""
+        records = list(self._records)
+        lines = [
+            "# HELP orbit_generations_total Generations completed since start",
+            "# TYPE orbit_generations_total counter",
+            f"orbit_generations_total {self.total}",
+            "# HELP orbit_window_output_tokens Tokens generated in the rolling window",
+            "# TYPE orbit_window_output_tokens gauge",
+            f"orbit_window_output_tokens {sum(r.output_tokens for r in records)}",
+        ]
+        for name in self.SUMMARY_FIELDS:
+            values = self._samples(records, name)
+            metric = f"orbit_{name}"
+            lines.append(f"# TYPE {metric} summary")
+            for quantile in (50, 95):
+                lines.append(f'{metric}{{quantile="{quantile / 100}"}} {percentile(values, quantile):.6f}')
+            lines.append(f"{metric}_sum {sum(values):.6f}")
+            lines.append(f"{metric}_count {len(values)}")
+
+        self.prometheus_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.prometheus_path.with_suffix(".tmp")
+        tmp_path.write_text("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.prometheus_path)
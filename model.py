@@ -1,104 +1,830 @@
 """Simple model wrapper for Orbit"""
-from llama_cpp import Llama
-import yaml
+import json
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Iterator
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Union
+
+from config import Change, SharedConfig, changed_sections
+from memory import MemoryEstimate, ModelShape, auto_n_ctx, estimate, kv_type, model_shape
+from metrics import GenerationMetrics, MetricsRecorder
+from prefix_cache import PrefixCache, model_fingerprint
+from response_cache import ResponseCache
+from sessions import compact_state
+from stub_backend import StubLlama
+from worker import GenerationHandle, GenerationWorker
+
+if TYPE_CHECKING:
+    from llama_cpp import Llama  # Imported on first model load - it takes seconds
+
+
+SYSTEM_START = "<|im_start|>system\n"
+SEGMENT_END = "<|im_end|>\n"
+STOP_SEQUENCES = ["<|im_end|>", "\n\nUser:", "User:"]
 
 
 class OrbitModel:
-    """Lightweight model wrapper - loads once, reuses forever"""
+    """Lightweight model wrapper - loads once, reuses forever
     
-    def __init__(self, config_path: str = "config.yaml"):
-        self.config = self._load_config(config_path)
-        self._llm = None
+    Several models can be registered in config (`model` plus `models`).
+    Loaded models stay resident under an LRU policy within a RAM budget,
+    so switching back to a recent model doesn't reload its weights.
+    """
     
-    def _load_config(self, path: str) -> dict:
-        """Load configuration from YAML"""
-        with open(path, 'r') as f:
-            return yaml.safe_load(f)
+    # performance fields baked into a loaded Llama; changing them means a reload
+    LOAD_FIELDS = [
+        "n_ctx", "n_gpu_layers", "n_threads", "n_batch",
+        "type_k", "type_v", "flash_attn", "use_mmap", "use_mlock", "ram_headroom_mb",
+    ]
     
-    def _detect_gpu(self) -> int:
-        """Detect GPU availability and return optimal n_gpu_layers"""
+    def __init__(self, config_path: str = "config.yaml", processes: int = 1):
+        self.shared_config = SharedConfig.load(config_path)
+        self.processes = processes  # Processes sharing this host's cores and RAM (see pool.py)
+        self.shared_config.subscribe(self._on_config_change)
+        self.active_model: str = self.config['model']['name']
+        self._llms: "OrderedDict[str, Llama]" = OrderedDict()  # Resident models, LRU order
+        self._vocabs: Dict[str, "Llama"] = {}  # Vocab-only instances for tokenizing before a model loads
+        self._trackers: Dict[str, object] = {}  # Speculative decoding acceptance trackers
+        self._load_settings: Dict[str, dict] = {}  # Resolved n_threads/n_batch per model (see load_settings)
+        self._context_sizes: Dict[str, int] = {}  # Resolved n_ctx per model (see context_size)
+        self._shapes: Dict[str, Optional[ModelShape]] = {}  # GGUF dimensions per model (and per draft model path)
+        self._loaded_with: Dict[str, str] = {}  # Load-time config of each resident model
+        self._stale: set = set()  # Resident models whose load-time config changed
+        self._prefix_cache = self._create_prefix_cache()
+        self._response_cache = self._create_response_cache()
+        
+        # Background warm-up (see start_warmup)
+        self._load_lock = threading.RLock()
+        self._warmup_thread: Optional[threading.Thread] = None
+        self._worker: Optional[GenerationWorker] = None  # Started by the first submit()
+        self.ready = threading.Event()
+        self.load_seconds: Dict[str, float] = {}
+        
+        # Per-request performance records (see /stats)
+        metrics_config = self.config.get('metrics', {})
+        self.metrics = MetricsRecorder(
+            window=metrics_config.get('window', 200),
+            jsonl_path=metrics_config.get('jsonl'),
+            prometheus_path=metrics_config.get('prometheus'),
+        )
+        self.last_metrics: Optional[GenerationMetrics] = None
+    
+    @property
+    def config(self) -> dict:
+        """The current config.yaml (reloaded by shared_config.check())"""
+        return self.shared_config.data
+    
+    def _load_signature(self, name: str) -> Optional[str]:
+        """Everything that goes into loading a model, or None if it's no longer registered"""
         try:
-            # Try to get GPU info from llama-cpp-python
-            # If GPU is available, use a high number of layers
-            # This is a simple heuristic - users can override in config
-            import platform
-            
-            # Check if CUDA is available (NVIDIA GPUs)
-            try:
-                from llama_cpp import llama_cpp
-                # If we can import and have GPU support compiled
-                # Default to using all layers on GPU
-                print("🟢 GPU detected! Will use GPU acceleration.")
-                return 43  # Default for mid-range GPUs like RTX 3060
-            except:
-                print("🟡 No GPU detected. Using CPU only.")
-                return 0  # CPU only
-        except Exception as e:
-            print(f"⚠️  GPU detection failed: {e}. Defaulting to config value.")
-            return None  # Use config value
-    
-    def get_llm(self) -> Llama:
-        """Lazy load - model loads only when first needed"""
-        if self._llm is None:
-            print("🔵 Loading model (one-time setup)...")
-            
-            model_config = self.config['model']
-            perf_config = self.config['performance']
-            
-            model_path = model_config['path']
-            if not Path(model_path).exists():
-                raise FileNotFoundError(f"Model not found: {model_path}")
-            
-            # Auto-detect GPU if not explicitly set
-            n_gpu_layers = perf_config.get('n_gpu_layers')
-            if n_gpu_layers is None or n_gpu_layers == -1:  # -1 means auto-detect
-                detected = self._detect_gpu()
-                n_gpu_layers = detected if detected is not None else 0
+            model_config = self.model_config(name)
+        except KeyError:
+            return None
+        perf_config = self.config['performance']
+        return json.dumps([
+            model_config,
+            {field: perf_config.get(field) for field in self.LOAD_FIELDS},
+            self.config.get('speculative'),
+        ], sort_keys=True, default=str)
+    
+    def _on_config_change(self, changes: List[Change]):
+        """
+        Apply a reloaded config
+        
+        Generation settings are read per request, so they need nothing here.
+        Resident models whose load-time settings changed are marked stale and
+        reloaded on their next use; caches and metric sinks are rebuilt.
+        """
+        sections = changed_sections(changes)
+        with self._load_lock:
+            if sections & {'model', 'models', 'performance', 'speculative'}:
+                self._load_settings.clear()
+                self._context_sizes.clear()
+                self._shapes.clear()
+                self._vocabs.clear()
+                for name in self._llms:
+                    if self._load_signature(name) != self._loaded_with.get(name):
+                        self._stale.add(name)
+                if self.active_model not in self._registry():
+                    self.active_model = self.config['model']['name']
             
-            self._llm = Llama(
-                model_path=model_path,
-                n_ctx=perf_config['n_ctx'],
-                n_threads=perf_config['n_threads'],
-                n_batch=perf_config['n_batch'],
-                n_gpu_layers=n_gpu_layers,
-                verbose=False,
+            if 'cache' in sections:
+                self._prefix_cache = self._create_prefix_cache()
+                self._response_cache = self._create_response_cache()
+        
+        if 'metrics' in sections:
+            metrics_config = self.config.get('metrics', {})
+            self.metrics.jsonl_path = Path(metrics_config['jsonl']) if metrics_config.get('jsonl') else None
+            self.metrics.prometheus_path = Path(metrics_config['prometheus']) if metrics_config.get('prometheus') else None
+    
+    def stale_models(self) -> List[str]:
+        """Resident models that will reload on next use because their config changed"""
+        return sorted(self._stale)
+    
+    def _unload(self, name: str):
+        """Drop a resident model (caller holds _load_lock)"""
+        llm = self._llms.pop(name)
+        self._trackers.pop(name, None)
+        self._loaded_with.pop(name, None)
+        self._stale.discard(name)
+        if hasattr(llm, 'close'):
+            llm.close()
+    
+    def list_models(self) -> List[str]:
+        """Names of all registered models (the default `model` entry first)"""
+        return list(self._registry())
+    
+    def _registry(self) -> Dict[str, dict]:
+        """Map model name -> model config from the `model` and `models` sections"""
+        registry = {self.config['model']['name']: self.config['model']}
+        for entry in self.config.get('models') or []:
+            registry.setdefault(entry['name'], entry)
+        return registry
+    
+    def model_config(self, model_name: Optional[str] = None) -> dict:
+        """Config entry for a model (the active one by default)"""
+        name = model_name or self.active_model
+        registry = self._registry()
+        if name not in registry:
+            raise KeyError(f"Unknown model: {name} (available: {', '.join(registry)})")
+        return registry[name]
+    
+    def use_model(self, model_name: str):
+        """Make model_name the default for generate/tokenize (loaded on first use)"""
+        self.model_config(model_name)  # Validate
+        self.active_model = model_name
+    
+    def resident_models(self) -> List[str]:
+        """Names of models currently loaded, least recently used first"""
+        return list(self._llms)
+    
+    def _create_prefix_cache(self) -> Optional[PrefixCache]:
+        """Set up on-disk prefix snapshots if enabled in config"""
+        cache_config = self.config.get('cache', {})
+        if not cache_config.get('prefix_states', False):
+            return None
+        cache_dir = Path(cache_config.get('dir', '.orbit_cache')) / "prefix"
+        max_bytes = int(cache_config.get('prefix_max_mb', 2048)) * 1024 * 1024
+        return PrefixCache(str(cache_dir), max_bytes)
+    
+    def _create_response_cache(self) -> Optional[ResponseCache]:
+        """Open the SQLite response cache if enabled in config"""
+        cache_config = self.config.get('cache', {})
+        if not cache_config.get('responses', False):
+            return None
+        path = Path(cache_config.get('dir', '.orbit_cache')) / "responses.sqlite3"
+        max_bytes = int(cache_config.get('responses_max_mb', 256)) * 1024 * 1024
+        return ResponseCache(str(path), max_bytes)
+    
+    def _detect_gpu(self) -> int:
+        """Return n_gpu_layers for this machine: all layers if llama.cpp can offload, else 0"""
+        from hardware import gpu_offload_supported
+        if gpu_offload_supported():
+            print("🟢 GPU offload available - offloading all layers (set n_gpu_layers to limit VRAM use)")
+            return -1  # llama.cpp: all layers
+        print("🟡 No GPU offload in this llama.cpp build. Using CPU only.")
+        return 0
+    
+    def n_gpu_layers(self, name: str) -> int:
+        """Configured GPU layers for a model (per-model value wins; -1/None = auto-detect)"""
+        perf_config = self.config['performance']
+        n_gpu_layers = self.model_config(name).get('n_gpu_layers', perf_config.get('n_gpu_layers'))
+        if n_gpu_layers is None or n_gpu_layers == -1:
+            n_gpu_layers = self._detect_gpu()
+        return n_gpu_layers
+    
+    def load_settings(self, name: str) -> dict:
+        """
+        Thread/batch settings for a model, resolving `auto` values
+        
+        `auto` takes the profile saved by `orbit tune` for this host and model;
+        without one, n_threads falls back to the physical core count and
+        n_batch to 512.
+        """
+        if name in self._load_settings:
+            return self._load_settings[name]
+        
+        perf_config = self.config['performance']
+        settings = {"n_threads": perf_config['n_threads'], "n_batch": perf_config['n_batch']}
+        if 'auto' in settings.values():
+            from tune import default_threads, load_profile
+            profile = None if self._is_stub(name) else load_profile(self.model_id(name))
+            if profile is None:
+                if not self._is_stub(name):
+                    print("💡 No tuning profile for this machine/model - run `python orbit.py tune`")
+                profile = {"n_threads": default_threads(), "n_batch": 512}
+            if settings['n_threads'] == 'auto':
+                settings['n_threads'] = profile['n_threads']
+                if 'n_threads_batch' in profile:
+                    settings['n_threads_batch'] = profile['n_threads_batch']
+            if settings['n_batch'] == 'auto':
+                settings['n_batch'] = profile['n_batch']
+        
+        # Pool workers each get their share of the cores
+        if self.processes > 1:
+            for key in ('n_threads', 'n_threads_batch'):
+                if key in settings:
+                    settings[key] = max(1, settings[key] // self.processes)
+        
+        self._load_settings[name] = settings
+        return settings
+    
+    def _kv_settings(self) -> dict:
+        """KV cache type names and flash attention, as configured"""
+        perf_config = self.config['performance']
+        return {
+            "type_k": perf_config.get('type_k', 'f16'),
+            "type_v": perf_config.get('type_v', 'f16'),
+            "flash_attn": bool(perf_config.get('flash_attn', False)),
+        }
+    
+    def memory_settings(self) -> dict:
+        """KV cache types, flash attention and mmap/mlock as Llama keyword arguments"""
+        perf_config = self.config['performance']
+        kv = self._kv_settings()
+        if kv['type_v'] not in ('f32', 'f16', 'bf16') and not kv['flash_attn']:
+            raise ValueError(
+                f"performance.type_v: {kv['type_v']} needs flash_attn: true "
+                f"(llama.cpp only quantizes the V cache with flash attention)"
             )
-            
-            print(f"✅ {model_config['name']} ready!")
-            print(f"⚙️  GPU Layers: {n_gpu_layers}\n")
+        return {
+            "type_k": kv_type(kv['type_k']),
+            "type_v": kv_type(kv['type_v']),
+            "flash_attn": kv['flash_attn'],
+            "use_mmap": bool(perf_config.get('use_mmap', True)),
+            "use_mlock": bool(perf_config.get('use_mlock', False)),
+        }
+    
+    def model_shape(self, name: str) -> Optional[ModelShape]:
+        """Layer/head dimensions from the model's GGUF header (None for the stub or unreadable files)"""
+        if name not in self._shapes:
+            self._shapes[name] = None if self._is_stub(name) else model_shape(self.model_config(name)['path'])
+        return self._shapes[name]
+    
+    def _ram_share(self, name: str, n_layer: int) -> float:
+        """Share of a model's layers that stay in system RAM rather than on the GPU"""
+        from hardware import gpu_offload_supported
+        perf_config = self.config['performance']
+        n_gpu_layers = self.model_config(name).get('n_gpu_layers', perf_config.get('n_gpu_layers'))
+        if not n_gpu_layers or not gpu_offload_supported():
+            return 1.0
+        if n_gpu_layers == -1:
+            return 0.0
+        return 1 - min(n_gpu_layers, n_layer) / n_layer
+    
+    def context_size(self, model_name: Optional[str] = None) -> int:
+        """
+        n_ctx for a model, resolving `auto`
+        
+        `auto` picks the largest context whose weights + KV cache + scratch
+        estimate fits in available RAM minus ram_headroom_mb, using the
+        model's GGUF dimensions and the configured KV cache types.
+        """
+        name = model_name or self.active_model
+        if name in self._context_sizes:
+            return self._context_sizes[name]
+        
+        perf_config = self.config['performance']
+        n_ctx = perf_config['n_ctx']
+        if n_ctx == 'auto':
+            n_ctx = self._auto_context_size(name)
+        self._context_sizes[name] = n_ctx
+        return n_ctx
+    
+    def _auto_context_size(self, name: str) -> int:
+        from hardware import available_ram_mb
+        if self._is_stub(name):
+            return StubLlama().n_ctx()
+        
+        shape = self.model_shape(name)
+        available_mb = available_ram_mb()
+        if shape is None or available_mb is None:
+            print("💡 Can't size n_ctx: auto on this machine (model dimensions or free RAM unknown) - using 4096")
+            return 4096
+        
+        perf_config = self.config['performance']
+        headroom_mb = perf_config.get('ram_headroom_mb', 1024)
+        available = (available_mb - headroom_mb) * 1024 * 1024
+        ram_share = self._ram_share(name, shape.n_layer)
+        speculative = self._speculative_memory(name)
+        if self.processes > 1:
+            # mmap'd weights are shared between processes; each needs its own KV cache and scratch
+            draft_bytes = speculative['draft'][0] if speculative['draft'] else 0
+            weights = int((self._model_bytes(name) + draft_bytes) * ram_share)
+            available = weights + (available - weights) // self.processes
+        n_ctx = auto_n_ctx(
+            available,
+            self._model_bytes(name),
+            shape,
+            n_batch=self.load_settings(name)['n_batch'],
+            **self._kv_settings(),
+            ram_share=ram_share,
+            **speculative,
+        )
+        per_process = f", split between {self.processes} processes" if self.processes > 1 else ""
+        print(f"📐 n_ctx auto: {n_ctx} tokens ({available_mb / 1024:.1f} GB RAM available, "
+              f"{headroom_mb} MB kept free{per_process})")
+        return n_ctx
+    
+    def memory_estimate(self, model_name: Optional[str] = None) -> Optional[MemoryEstimate]:
+        """Weights, KV cache and scratch estimate at the resolved n_ctx (None without GGUF dimensions)"""
+        name = model_name or self.active_model
+        shape = self.model_shape(name)
+        if shape is None:
+            return None
+        return estimate(
+            self._model_bytes(name),
+            shape,
+            self.context_size(name),
+            n_batch=self.load_settings(name)['n_batch'],
+            **self._kv_settings(),
+            **self._speculative_memory(name),
+        )
+    
+    def speculative_config(self, name: str) -> dict:
+        """The speculative section for a model (a per-model section wins)"""
+        return self.model_config(name).get('speculative', self.config.get('speculative', {}))
+    
+    def _speculative_memory(self, name: str) -> dict:
+        """
+        What speculative decoding adds to a model's memory estimate
+        
+        Any speculative mode makes llama-cpp-python keep logits for every
+        position (logits_all); draft mode also loads the draft GGUF with the
+        same context settings.
+        """
+        spec_config = self.speculative_config(name)
+        mode = spec_config.get('mode', 'none')
+        draft = None
+        if mode == 'draft' and spec_config.get('draft_model'):
+            draft_path = spec_config['draft_model']
+            if draft_path not in self._shapes:
+                self._shapes[draft_path] = model_shape(draft_path)
+                if self._shapes[draft_path] is None:
+                    print(f"💡 Draft model {draft_path} isn't in the memory estimate (can't read its GGUF header)")
+            if self._shapes[draft_path] is not None:
+                draft = (Path(draft_path).stat().st_size, self._shapes[draft_path])
+        return {"logits_all": mode not in ('none', None), "draft": draft}
+    
+    def _print_memory_estimate(self, name: str):
+        """Show what loading will take, and warn if it won't fit in RAM"""
+        from hardware import available_ram_mb
+        memory = self.memory_estimate(name)
+        if memory is None:
+            return
+        kv = self._kv_settings()
+        gb = 1024 ** 3
+        logits = f" + logits_all {memory.logits / gb:.1f} GB" if memory.logits else ""
+        draft = " (incl. draft model)" if self._speculative_memory(name)['draft'] else ""
+        print(
+            f"🧮 Memory estimate{draft}: weights {memory.weights / gb:.1f} GB + "
+            f"KV cache {memory.kv / gb:.1f} GB ({kv['type_k']}/{kv['type_v']}, "
+            f"{self.context_size(name)} tokens) + scratch {memory.scratch / gb:.1f} GB{logits} = {memory.total / gb:.1f} GB"
+        )
+        if memory.logits:
+            print("   logits_all: speculative decoding keeps scores for every position - lower n_ctx if that's too much")
+        ram_share = self._ram_share(name, self.model_shape(name).n_layer)
+        if ram_share < 1:
+            print(f"   {1 - ram_share:.0%} of layers on the GPU - {memory.in_ram(ram_share) / gb:.1f} GB in system RAM")
+        available_mb = available_ram_mb()
+        if available_mb is not None and memory.in_ram(ram_share) > available_mb * 1024 * 1024:
+            print(
+                f"⚠️  More than the {available_mb / 1024:.1f} GB of available RAM - expect swapping. "
+                f"Lower n_ctx (or use `auto`), quantize the KV cache (type_k/type_v) or enable flash_attn."
+            )
+    
+    def get_llm(self, model_name: Optional[str] = None) -> "Llama":
+        """Lazy load - model loads only when first needed, then stays resident"""
+        name = model_name or self.active_model
+        with self._load_lock:
+            # Models removed from config are dropped; changed ones reload
+            for other in [n for n in self._stale if self._load_signature(n) is None]:
+                self._unload(other)
+            if name in self._stale:
+                print(f"♻️  Load settings for {name} changed - reloading")
+                self._unload(name)
+            if name in self._llms:
+                self._llms.move_to_end(name)
+                return self._llms[name]
+            return self._load(name)
+    
+    def _load(self, name: str) -> "Llama":
+        """Load a registered model's weights (caller holds _load_lock)"""
+        print(f"🔵 Loading model {name} (one-time setup)...")
+        started = time.perf_counter()
+        
+        model_config = self.model_config(name)
+        
+        if self._is_stub(name):
+            self._llms[name] = StubLlama(n_ctx=self.context_size(name), **model_config.get('stub', {}))
+            self._loaded_with[name] = self._load_signature(name)
+            self.load_seconds[name] = time.perf_counter() - started
+            print(f"✅ {model_config['name']} ready! (stub backend)\n")
+            return self._llms[name]
+        
+        model_path = model_config['path']
+        if not Path(model_path).exists():
+            raise FileNotFoundError(f"Model not found: {model_path}")
+        
+        n_gpu_layers = self.n_gpu_layers(name)
         
-        return self._llm
+        # Make room before loading so peak RAM stays within budget
+        self._evict_models(incoming_bytes=self._model_bytes(name))
+        
+        llm_kwargs = {
+            "n_ctx": self.context_size(name),
+            "n_gpu_layers": n_gpu_layers,
+            **self.load_settings(name),
+            **self.memory_settings(),
+        }
+        self._print_memory_estimate(name)
+        
+        # Optional speculative decoding (per-model setting wins, draft must share the vocab)
+        from speculative import create_draft_model
+        spec_config = self.speculative_config(name)
+        tracker = create_draft_model(spec_config, llm_kwargs)
+        if tracker is not None:
+            self._trackers[name] = tracker
+        
+        from llama_cpp import Llama
+        self._llms[name] = Llama(
+            model_path=model_path,
+            draft_model=tracker,
+            verbose=False,
+            **llm_kwargs,
+        )
+        self._vocabs.pop(name, None)
+        self._loaded_with[name] = self._load_signature(name)
+        self.load_seconds[name] = time.perf_counter() - started
+        
+        print(f"✅ {model_config['name']} ready! (loaded in {self.load_seconds[name]:.1f}s)")
+        print(f"⚙️  GPU Layers: {'all' if n_gpu_layers == -1 else n_gpu_layers}, "
+              f"threads: {llm_kwargs['n_threads']}, batch: {llm_kwargs['n_batch']}")
+        if tracker is not None:
+            print(f"⚡ Speculative decoding: {spec_config['mode']}")
+        print()
+        
+        return self._llms[name]
     
-    def generate(self, prompt: str, stream: bool = True) -> Iterator[str]:
+    def start_warmup(self, prompt_fn: Optional[Callable[[], List[int]]] = None) -> threading.Thread:
+        """
+        Load the active model and run a tiny decode on a background thread
+        
+        Generation requests made meanwhile wait on the `ready` event, so the
+        load is hidden behind the time the user spends typing.
+        
+        Args:
+            prompt_fn: Returns the prompt prefix to prime (e.g. the system
+                block's token IDs), so its KV state is ready or restored too
+        """
+        if self._warmup_thread is not None:
+            return self._warmup_thread
+        
+        def warmup():
+            started = time.perf_counter()
+            try:
+                llm = self.get_llm()
+                prompt = prompt_fn() if prompt_fn else self.tokenize("Hello", add_bos=True)
+                self._restore_prefix(llm, prompt, self.active_model)
+                for _ in llm(prompt, max_tokens=1, stream=True):
+                    pass
+                print(f"🟢 Warm-up finished in {time.perf_counter() - started:.1f}s")
+            except Exception as e:
+                # The first real request will load (and report) again
+                print(f"⚠️  Warm-up failed: {e}")
+            finally:
+                self.ready.set()
+        
+        self.ready.clear()
+        self._warmup_thread = threading.Thread(target=warmup, name="orbit-warmup", daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
+    
+    def wait_ready(self):
+        """Block until a running warm-up has finished (no-op otherwise)"""
+        thread = self._warmup_thread
+        if thread is not None and thread is not threading.current_thread():
+            self.ready.wait()
+    
+    @property
+    def is_warming_up(self) -> bool:
+        """True while the background warm-up is still running"""
+        return self._warmup_thread is not None and not self.ready.is_set()
+    
+    def _is_stub(self, name: str) -> bool:
+        """True if the model uses the deterministic stub backend (no GGUF file)"""
+        return self.model_config(name).get('backend') == 'stub'
+    
+    def _model_bytes(self, name: str) -> int:
+        """Size of a model's weights file (0 for the stub backend)"""
+        if self._is_stub(name):
+            return 0
+        return Path(self.model_config(name)['path']).stat().st_size
+    
+    def model_id(self, model_name: Optional[str] = None) -> str:
+        """Stable identity of a model's weights, for keying caches"""
+        name = model_name or self.active_model
+        if self._is_stub(name):
+            return "stub"
+        return model_fingerprint(self.model_config(name)['path'])
+    
+    def _evict_models(self, incoming_bytes: int):
+        """Unload least recently used models until incoming_bytes fits the RAM budget"""
+        budget_mb = self.config['performance'].get('resident_models_mb')
+        if budget_mb is None:
+            return
+        budget = int(budget_mb) * 1024 * 1024
+        
+        def resident_bytes() -> int:
+            return sum(self._model_bytes(n) for n in self._llms)
+        
+        while self._llms and resident_bytes() + incoming_bytes > budget:
+            name = next(iter(self._llms))
+            self._unload(name)
+            print(f"💤 Unloaded {name} to stay within resident_models_mb")
+    
+    def tokenize(self, text: str, add_bos: bool = False, model_name: Optional[str] = None) -> List[int]:
+        """
+        Tokenize text with the model's vocabulary
+        
+        Special tokens (<|im_start|> etc.) are parsed. With add_bos=True a BOS
+        token is prepended only if the model expects one, matching how a
+        string prompt is tokenized. Before the model (the active one unless
+        model_name is given) is loaded this uses a cheap vocab-only instance.
+        """
+        name = model_name or self.active_model
+        llm = self._llms.get(name) if name not in self._stale else None  # A stale model may have the old vocabulary
+        if llm is None:
+            if name not in self._vocabs:
+                if self._is_stub(name):
+                    self._vocabs[name] = StubLlama()
+                else:
+                    from llama_cpp import Llama
+                    self._vocabs[name] = Llama(
+                        model_path=self.model_config(name)['path'],
+                        vocab_only=True,
+                        verbose=False,
+                    )
+            llm = self._vocabs[name]
+        return llm.tokenize(text.encode('utf-8'), add_bos=add_bos, special=True)
+    
+    def _static_prefix(self, prompt: Union[str, List[int]], model_name: str) -> Optional[List[int]]:
+        """Return the token IDs of the prompt's leading ChatML system block, if any"""
+        if isinstance(prompt, str):
+            if not prompt.startswith(SYSTEM_START):
+                return None
+            end = prompt.find(SEGMENT_END)
+            if end == -1:
+                return None
+            return self.tokenize(prompt[:end + len(SEGMENT_END)], add_bos=True, model_name=model_name)
+        
+        # Token prompt: the system header may follow a BOS token
+        start_ids = self.tokenize(SYSTEM_START, model_name=model_name)
+        if prompt[:len(start_ids)] != start_ids and prompt[1:len(start_ids) + 1] != start_ids:
+            return None
+        end_ids = self.tokenize(SEGMENT_END, model_name=model_name)
+        try:
+            end = prompt.index(end_ids[0])
+        except ValueError:
+            return None
+        if prompt[end:end + len(end_ids)] != end_ids:
+            return None
+        return list(prompt[:end + len(end_ids)])
+    
+    def _restore_prefix(self, llm: "Llama", prompt: Union[str, List[int]], model_name: str) -> Optional[str]:
+        """
+        Make sure the static system prefix is already in the KV cache
+        
+        Reuses the live state when it already starts with the prefix, then
+        falls back to a disk snapshot, and only evaluates from scratch on a
+        miss (saving the result for next time). llama.cpp's own prefix
+        matching then skips these tokens when the full prompt is evaluated.
+        
+        Returns:
+            "live", "snapshot" or "evaluated", or None if not applicable
+        """
+        if self._prefix_cache is None:
+            return None
+        tokens = self._static_prefix(prompt, model_name)
+        if tokens is None:
+            return None
+        
+        if list(llm.input_ids[:min(llm.n_tokens, len(tokens))]) == tokens:
+            return "live"  # Already evaluated in this process
+        
+        key = PrefixCache.make_key(
+            self.model_id(model_name),
+            tokens,
+            self.context_size(model_name),
+            self.load_settings(model_name)['n_batch'],
+        )
+        
+        state = self._prefix_cache.load(key)
+        if state is not None:
+            llm.load_state(state)
+            return "snapshot"
+        
+        llm.reset()
+        llm.eval(tokens)
+        self._prefix_cache.save(key, compact_state(llm.save_state()))  # Without the logits of every batch position
+        return "evaluated"
+    
+    @staticmethod
+    def _common_prefix(llm: "Llama", ids: List[int]) -> int:
+        """Leading tokens of ids that are already in the KV state"""
+        common = 0
+        for a, b in zip(llm.input_ids[:llm.n_tokens], ids):
+            if a != b:
+                break
+            common += 1
+        return common
+    
+    @classmethod
+    def _cached_length(cls, llm: "Llama", prompt_ids: List[int]) -> int:
+        """Prompt tokens llama.cpp will reuse from the current KV state (the last one is always re-evaluated)"""
+        return cls._common_prefix(llm, prompt_ids[:-1])
+    
+    def generate(
+        self,
+        prompt: Union[str, List[int]],
+        stream: bool = True,
+        model_name: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        background: bool = False,
+    ) -> Iterator[str]:
         """
         Generate response with streaming
         
         Args:
-            prompt: Complete formatted prompt
+            prompt: Complete formatted prompt, as text or token IDs
             stream: Whether to stream tokens
+            model_name: Registered model to use (defaults to the active one)
+            max_tokens: Overrides generation.max_tokens
+            background: Housekeeping work (e.g. summaries) - kept out of
+                last_metrics and the metrics window
             
         Yields:
             Generated tokens
         """
-        llm = self.get_llm()
-        gen_config = self.config['generation']
+        model_name = model_name or self.active_model
+        sampling = self._sampling_params()
+        if max_tokens is not None:
+            sampling['max_tokens'] = max_tokens
         
-        response = llm(
-            prompt,
-            max_tokens=gen_config['max_tokens'],
-            temperature=gen_config['temperature'],
-            top_p=gen_config['top_p'],
-            top_k=gen_config['top_k'],
-            repeat_penalty=gen_config['repeat_penalty'],
-            stream=stream,
-            stop=["<|im_end|>", "\n\nUser:", "User:"],
-        )
+        metrics = GenerationMetrics(model=model_name)
+        started = time.perf_counter()
+        prompt_ids = self.tokenize(prompt, add_bos=True, model_name=model_name) if isinstance(prompt, str) else prompt
+        metrics.prompt_tokens = len(prompt_ids)
+        
+        # Deterministic requests may be answered from the response cache
+        cache_key = None
+        cached = None
+        tracker = None
+        if self._response_cache is not None and self._is_deterministic(sampling):
+            cache_key = ResponseCache.make_key(self.model_id(model_name), prompt_ids, sampling)
+            cached = self._response_cache.get(cache_key)
+        
+        prefill_started = None
+        if cached is not None:
+            metrics.response_cached = True
+            chunks = self._cached_chunks(cached, stream)
+        else:
+            self.wait_ready()
+            llm = self.get_llm(model_name)
+            reused = self._cached_length(llm, prompt_ids)  # Measured before the prefix restore, which may evaluate
+            prefill_started = time.perf_counter()
+            metrics.prefix_source = self._restore_prefix(llm, prompt, model_name)
+            metrics.restore_s = time.perf_counter() - prefill_started  # Not the model load above
+            if metrics.prefix_source == "snapshot":
+                # Loaded from disk rather than evaluated: neither cached nor part of prefill
+                metrics.restored_tokens = self._cached_length(llm, prompt_ids)
+                prefill_started = time.perf_counter()
+            elif metrics.prefix_source != "evaluated":  # An evaluated prefix started from a reset context
+                metrics.cached_tokens = reused
+            tracker = self._trackers.get(model_name)
+            if tracker is not None:
+                tracker.begin()
+            chunks = self._llm_chunks(llm(prompt, stream=stream, **sampling), stream)
+        
+        first_token_at = None
+        texts = []
+        try:
+            for text, finish_reason, n_tokens in chunks:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                metrics.output_tokens += n_tokens
+                metrics.stop_reason = finish_reason or metrics.stop_reason
+                texts.append(text)
+                yield text
+        except GeneratorExit:
+            metrics.stop_reason = "cancelled"
+            raise
+        finally:
+            finished = time.perf_counter()
+            metrics.ttft_s = (first_token_at or finished) - started
+            if prefill_started is not None:
+                metrics.prefill_s = (first_token_at or finished) - prefill_started
+            metrics.decode_s = finished - (first_token_at or finished)
+            metrics.total_s = finished - started
+            if cached is None and tracker is not None:
+                metrics.draft_tokens, metrics.accepted_tokens = tracker.counts()
+            if not background:
+                self.last_metrics = metrics
+                self.metrics.record(metrics)
+            
+            # Only complete answers are worth replaying
+            if cache_key and cached is None and metrics.stop_reason in ("stop", "length"):
+                self._response_cache.put(cache_key, texts)
+    
+    def save_state(self, model_name: Optional[str] = None):
+        """KV state of a loaded model (prompt + answer evaluated so far), or None if not loaded"""
+        llm = self._llms.get(model_name or self.active_model)
+        return llm.save_state() if llm is not None else None
+    
+    def load_state(self, state, model_name: Optional[str] = None):
+        """Restore a state from save_state (same model file and context settings)"""
+        self.wait_ready()
+        self.get_llm(model_name).load_state(state)
+    
+    def prefill(self, tokens: List[int], model_name: Optional[str] = None) -> Iterator[str]:
+        """
+        Evaluate a known prompt prefix into the KV cache ahead of the request
+        
+        Tokens already in the KV state are skipped and the rest is evaluated
+        in n_batch chunks, yielding after each so a worker job can be
+        cancelled between chunks. The next generate() then only evaluates
+        what follows the prefix (llama.cpp matches it automatically).
+        """
+        name = model_name or self.active_model
+        self.wait_ready()
+        llm = self.get_llm(name)
+        self._restore_prefix(llm, tokens, name)
+        
+        start = self._common_prefix(llm, tokens)
+        llm.n_tokens = start  # eval() discards KV entries past this point
+        n_batch = self.load_settings(name)['n_batch']
+        for i in range(start, len(tokens), n_batch):
+            llm.eval(tokens[i:i + n_batch])
+            yield ""
+    
+    def start_prefill(self, tokens: List[int], model_name: Optional[str] = None) -> GenerationHandle:
+        """Run prefill on the worker thread; cancel() stops it between chunks"""
+        return self._get_worker().submit(lambda: self.prefill(tokens, model_name))
+    
+    def _get_worker(self) -> GenerationWorker:
+        with self._load_lock:
+            if self._worker is None:
+                self._worker = GenerationWorker()
+        return self._worker
+    
+    def submit(self, prompt: Union[str, List[int]], model_name: Optional[str] = None, **kwargs) -> GenerationHandle:
+        """
+        Stream a generation on the dedicated worker thread
         
+        Iterate the returned handle for tokens; handle.cancel() stops the
+        decode before the next token, and handle.text() holds what was
+        generated so far. kwargs go to generate (max_tokens, background).
+        """
+        return self._get_worker().submit(lambda: self.generate(prompt, stream=True, model_name=model_name, **kwargs))
+    
+    def _sampling_params(self) -> dict:
+        """Generation parameters passed to llama.cpp (also part of the response cache key)"""
+        gen_config = self.config['generation']
+        params = {
+            "max_tokens": gen_config['max_tokens'],
+            "temperature": gen_config['temperature'],
+            "top_p": gen_config['top_p'],
+            "top_k": gen_config['top_k'],
+            "repeat_penalty": gen_config['repeat_penalty'],
+            "stop": STOP_SEQUENCES,
+        }
+        if gen_config.get('seed') is not None:
+            params['seed'] = gen_config['seed']
+        return params
+    
+    @staticmethod
+    def _is_deterministic(sampling: dict) -> bool:
+        """Same prompt + params give the same text: greedy sampling or a fixed seed"""
+        return sampling['temperature'] == 0 or 'seed' in sampling
+    
+    @staticmethod
+    def _llm_chunks(response, stream: bool) -> Iterator[tuple]:
+        """Normalize llama.cpp output to (text, finish_reason, n_tokens) tuples"""
         if stream:
             for chunk in response:
-                token = chunk["choices"][0]["text"]
-                yield token
+                choice = chunk["choices"][0]
+                yield choice["text"], choice["finish_reason"], 1
+        else:
+            choice = response["choices"][0]
+            yield choice["text"], choice["finish_reason"], response.get("usage", {}).get("completion_tokens", 0)
+    
+    @staticmethod
+    def _cached_chunks(cached: List[str], stream: bool) -> Iterator[tuple]:
+        """Replay a cached response as (text, finish_reason, n_tokens) tuples"""
+        if stream:
+            for text in cached:
+                yield text, None, 1
+            yield "", "cached", 0
         else:
-            yield response["choices"][0]["text"]
+            yield "".join(cached), "cached", len(cached)
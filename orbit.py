@@ -1,21 +1,42 @@
-"""Orbit - Offline Coding Assistant"""
-from model import OrbitModel
-from context import ContextManager
-from rich.console import Console
-from rich.markdown import Markdown
-from rich.panel import Panel
-from prompt_toolkit import PromptSession
-from prompt_toolkit.history import FileHistory
+"""Orbit - Offline Coding Assistant
+
+Heavy dependencies (llama_cpp, rich, prompt_toolkit, yaml) are imported
+where they are first used, so `--version`, `--check` and the subcommands
+start without paying for them.
+"""
+from functools import partial
 from pathlib import Path
+import sys
+from typing import List, Tuple
+
+from config import describe
+from streaming import StreamBuffer, stable_boundary
+
+
+__version__ = "0.2.0"
 
 
 class Orbit:
     """Main Orbit CLI interface"""
     
     def __init__(self):
+        from rich.console import Console
+        from prompt_toolkit import PromptSession
+        from prompt_toolkit.history import FileHistory
+        from context import ContextManager
+        from diffs import EditSession
+        from model import OrbitModel
+        from sessions import SavedSessions
+        from summarizer import ConversationSummarizer
+        
         self.console = Console()
         self.model = OrbitModel()
         self.context_mgr = ContextManager()
+        self.context_mgr.set_tokenizer(self.model.tokenize, self.model.context_size())
+        cache_dir = Path(self.model.config.get('cache', {}).get('dir', '.orbit_cache'))
+        self.saved_sessions = SavedSessions(cache_dir / "sessions")
+        self.edits = EditSession()
+        self.summarizer = ConversationSummarizer(self.model, self.context_mgr)
         
         # Setup prompt with history
         history_file = Path.home() / ".orbit_history"
@@ -23,6 +44,7 @@ class Orbit:
     
     def show_welcome(self):
         """Display welcome message"""
+        from rich.markdown import Markdown
         welcome = """
 # 🌍 Orbit - Offline Coding Assistant
 
@@ -31,6 +53,12 @@ class Orbit:
 Commands:
 - `/help` - Show this help
 - `/context` - Show loaded context info
+- `/model [name]` - List models or switch to one
+- `/stats` - Show generation performance (p50/p95)
+- `/save <name>` - Save this conversation (with model state)
+- `/load [name]` - List saved conversations or resume one
+- `/edit [files|off]` - Attach files; answers become diffs applied locally
+- `/apply` - Write the changes proposed in edit mode to disk
 - `/clear` - Clear conversation history
 - `/exit` - Exit Orbit
 
@@ -50,7 +78,9 @@ Just type your coding questions naturally!
         Returns:
             True to continue, False to exit
         """
-        cmd = cmd.strip().lower()
+        cmd, _, arg = cmd.strip().partition(" ")
+        cmd = cmd.lower()
+        arg = arg.strip()
         
         if cmd == "/exit" or cmd == "/quit":
             self.console.print("[yellow]Goodbye! 👋[/yellow]")
@@ -65,7 +95,49 @@ Just type your coding questions naturally!
             self.console.print(f"  System Rules: {'✅' if ctx_info['system'] else '❌'}")
             self.console.print(f"  Project Info: {'✅' if ctx_info['project'] else '❌'}")
             self.console.print(f"  Conventions: {'✅' if ctx_info['conventions'] else '❌'}")
-            self.console.print(f"  History: {ctx_info['history_length']} messages\n")
+            self.console.print(
+                f"  History: {ctx_info['history_length']} messages "
+                f"({ctx_info['history_tokens']}/{ctx_info['history_budget']} tokens)"
+            )
+            if self.model.config['context'].get('summarize', False):
+                self.console.print(
+                    f"  Summary: {ctx_info['summary_tokens']} tokens covering {self.summarizer.folded_messages} messages "
+                    f"({self.summarizer.summaries} updates, {self.summarizer.cancelled} deferred, "
+                    f"{ctx_info['unsummarized']} waiting)"
+                )
+            static = self.context_mgr.static_tokens()
+            saved = 1 - static['compacted'] / static['raw'] if static['raw'] else 0.0
+            self.console.print(
+                f"  Static Context: {static['raw']} tokens, {static['compacted']} compacted ({saved:.0%} less prefill) "
+                f"- compaction {'on' if static['enabled'] else 'off'}"
+            )
+            cache = ctx_info['cache']
+            self.console.print(f"  File Cache: {cache['hits']} hits, {cache['misses']} misses")
+            if ctx_info['retrieval'] is not None:
+                index, last = ctx_info['retrieval'], ctx_info['last_retrieval']
+                self.console.print(
+                    f"  Code Index: {index['files']} files, {index['chunks']} chunks "
+                    f"(last turn: {last['chunks']} chunks, {last['tokens']} tokens)"
+                )
+            self.console.print()
+        
+        elif cmd == "/model":
+            self.switch_model(arg)
+        
+        elif cmd == "/stats":
+            self.show_stats()
+        
+        elif cmd == "/save":
+            self.save_session(arg)
+        
+        elif cmd == "/load":
+            self.load_session(arg)
+        
+        elif cmd == "/edit":
+            self.edit_files(arg)
+        
+        elif cmd == "/apply":
+            self.apply_edits()
         
         elif cmd == "/clear":
             self.context_mgr.clear_history()
@@ -77,42 +149,340 @@ Just type your coding questions naturally!
         
         return True
     
+    def show_stats(self):
+        """Print the last request's metrics and rolling p50/p95 aggregates"""
+        summary = self.model.metrics.summary()
+        if not summary['window']:
+            self.console.print("[yellow]No generations yet[/yellow]")
+            return
+        
+        last = self.model.last_metrics
+        self.console.print("\n[cyan]Last Request:[/cyan]")
+        self.console.print(
+            f"  {last.prompt_tokens} prompt tokens ({last.cached_tokens} cached, {last.restored_tokens} restored, "
+            f"prefix: {last.prefix_source or 'n/a'}) • {last.output_tokens} output tokens • "
+            f"stop: {last.stop_reason}"
+        )
+        self.console.print(
+            f"  TTFT {last.ttft_s:.2f}s • prefill {last.prefill_s:.2f}s ({last.prefill_tps:.1f} t/s) • "
+            f"decode {last.decode_tps:.1f} t/s • total {last.total_s:.2f}s"
+        )
+        if last.draft_tokens:
+            self.console.print(f"  Speculative acceptance: {last.acceptance_rate:.0%}")
+        if last.edit_mode:
+            outcome = "diff applied" if last.patch_applied else "diff didn't apply"
+            self.console.print(f"  Edit: {outcome} • ~{last.saved_tokens} output tokens saved")
+        
+        self.console.print(f"\n[cyan]Last {summary['window']} Requests:[/cyan]  (p50 / p95)")
+        self.console.print(f"  TTFT:    {summary['ttft_s']['p50']:.2f}s / {summary['ttft_s']['p95']:.2f}s")
+        self.console.print(f"  Prefill: {summary['prefill_tps']['p50']:.1f} / {summary['prefill_tps']['p95']:.1f} t/s")
+        self.console.print(f"  Decode:  {summary['decode_tps']['p50']:.1f} / {summary['decode_tps']['p95']:.1f} t/s")
+        self.console.print(f"  Total:   {summary['total_s']['p50']:.2f}s / {summary['total_s']['p95']:.2f}s")
+        self.console.print(f"  Prefix reused: {summary['prefix_reuse_rate']:.0%}")
+        self.console.print(f"  Answered from response cache: {summary['response_cache_rate']:.0%}")
+        if summary['draft_tokens']:
+            self.console.print(
+                f"  Speculative acceptance: {summary['acceptance_rate']:.0%} "
+                f"({summary['accepted_tokens']}/{summary['draft_tokens']} drafted tokens)"
+            )
+        if summary['edit_requests']:
+            self.console.print(
+                f"  Edits: {summary['edits_applied']}/{summary['edit_requests']} diffs applied, "
+                f"~{summary['saved_tokens']} output tokens saved"
+            )
+        self.console.print()
+    
+    def switch_model(self, name: str):
+        """List registered models, or make `name` the active one"""
+        models = self.model.list_models()
+        if not name:
+            resident = self.model.resident_models()
+            self.console.print("\n[cyan]Models:[/cyan]")
+            for model_name in models:
+                marker = "▶" if model_name == self.model.active_model else " "
+                loaded = " [dim](loaded)[/dim]" if model_name in resident else ""
+                self.console.print(f"  {marker} {model_name}{loaded}")
+            self.console.print()
+            return
+        
+        matches = [m for m in models if m.lower() == name.lower()]
+        if not matches:
+            self.console.print(f"[red]Unknown model: {name}[/red] (available: {', '.join(models)})")
+            return
+        
+        self.model.use_model(matches[0])
+        # Re-encode history with the new vocabulary
+        self.context_mgr.set_tokenizer(
+            partial(self.model.tokenize, model_name=matches[0]), self.model.context_size(matches[0]), vocab=matches[0]
+        )
+        self.console.print(f"[green]✓ Switched to {matches[0]}[/green]")
+    
+    def save_session(self, name: str):
+        """Save history and the evaluated KV state under name"""
+        if not name:
+            self.console.print("[red]Usage: /save <name>[/red]")
+            return
+        try:
+            path, size = self.saved_sessions.save(name, self.context_mgr, self.model)
+        except ValueError as e:
+            self.console.print(f"[red]{e}[/red]")
+            return
+        self.console.print(f"[green]✓ Saved {len(self.context_mgr.conversation_history)} messages to {path} ({size / 1e6:.1f} MB)[/green]")
+    
+    def load_session(self, name: str):
+        """List saved sessions, or resume one"""
+        if not name:
+            names = self.saved_sessions.list()
+            self.console.print("\n[cyan]Saved sessions:[/cyan] " + (", ".join(names) if names else "none"))
+            return
+        try:
+            info = self.saved_sessions.load(name, self.context_mgr, self.model)
+        except (FileNotFoundError, ValueError) as e:
+            self.console.print(f"[red]{e}[/red]")
+            return
+        self.console.print(f"[green]✓ Loaded {info['messages']} messages on {info['model']} (saved {info['saved_at']})[/green]")
+        if info['restored']:
+            self.console.print(f"  ⚡ Model state restored ({info['state_tokens']} tokens, no re-evaluation)")
+        else:
+            self.console.print(f"  [yellow]History only - {info['reason']}; it will be re-evaluated[/yellow]")
+    
+    def edit_files(self, arg: str):
+        """Attach files for edit mode, list them, or turn edit mode off"""
+        if arg == "off":
+            self.edits.detach()
+            self.console.print("[green]✓ Edit mode off[/green]")
+            return
+        if arg:
+            missing = self.edits.attach(arg.split())
+            if missing:
+                self.console.print(f"[red]Not found: {', '.join(missing)}[/red]")
+        if not self.edits.active:
+            self.console.print("[yellow]No files attached[/yellow] (usage: /edit <file> [file...])")
+            return
+        self.console.print(f"✏️  Editing: {', '.join(self.edits.files)} - answers will be diffs")
+        if self.edits.pending:
+            self.console.print(f"  Pending changes: {', '.join(self.edits.pending)} (/apply to write)")
+    
+    def apply_edits(self):
+        """Write the changes staged by edit mode"""
+        if not self.edits.pending:
+            self.console.print("[yellow]No pending changes[/yellow]")
+            return
+        from diffs import PatchError
+        try:
+            written = self.edits.write_pending()
+        except PatchError as e:
+            self.console.print(f"[red]✗ {e}[/red]")
+            return
+        self.console.print(f"[green]✓ Wrote {', '.join(written)}[/green]")
+    
+    def reload_config(self) -> bool:
+        """Apply config.yaml edits made since the last message and report them; True if any"""
+        changes = self.model.shared_config.check()
+        if not changes:
+            return False
+        self.console.print("[cyan]🔄 config.yaml reloaded:[/cyan]")
+        for line in describe(changes):
+            self.console.print(f"  {line}", markup=False, highlight=False)
+        stale = self.model.stale_models()
+        if stale:
+            self.console.print(f"  [yellow]♻️  {', '.join(stale)} will reload with the new settings[/yellow]")
+        return True
+    
+    def start_prefill(self):
+        """
+        Evaluate the next prompt's known prefix on the worker while the user types
+        
+        Returns the job's handle, or None when disabled or a summary is about
+        to change the prefix anyway.
+        """
+        if not self.model.config['performance'].get('prefill_while_typing', True) or self.summarizer.pending:
+            return None
+        return self.model.start_prefill(self.context_mgr.build_prefix_tokens())
+    
+    def stream_response(self, tokens) -> str:
+        """
+        Render a streamed answer and return its full text
+        
+        Redraws are capped at display.stream_fps. With Markdown rendering,
+        finished blocks are printed once and only the block still being
+        written is redrawn live, so each frame costs the same however long
+        the answer gets.
+        """
+        from rich.live import Live
+        from rich.markdown import Markdown
+        
+        display_config = self.model.config.get('display', {})
+        buffer = StreamBuffer(display_config.get('stream_fps', 15))
+        
+        if not display_config.get('markdown', True) or not self.console.is_terminal:
+            printed = 0
+            for text in buffer.frames(tokens):
+                self.console.print(text[printed:], end="", markup=False, highlight=False)
+                printed = len(text)
+            self.console.print()
+            return buffer.text()
+        
+        committed = 0
+        with Live(Markdown(""), console=self.console, auto_refresh=False, vertical_overflow="visible") as live:
+            for text in buffer.frames(tokens):
+                boundary = committed + stable_boundary(text[committed:])
+                if boundary > committed:
+                    live.console.print(Markdown(text[committed:boundary]))
+                    live.console.print()
+                    committed = boundary
+                live.update(Markdown(text[committed:]), refresh=True)
+        return buffer.text()
+    
+    def generate(self, prompt: List[int], watch=None) -> Tuple[str, bool]:
+        """
+        Generate on the worker thread and stream the answer; Ctrl-C cancels within one token
+        
+        Args:
+            prompt: Prompt token IDs
+            watch: Optional callable wrapping the handle's token stream
+        
+        Returns:
+            (answer, cancelled) - the answer is "" when a cancelled one is dropped
+        """
+        handle = self.model.submit(prompt)
+        try:
+            return self.stream_response(watch(handle) if watch else handle), False
+        except KeyboardInterrupt:
+            handle.cancel()
+            handle.wait()
+            response_text = handle.text()
+            keep = self.model.config['generation'].get('on_cancel', 'keep') == 'keep'
+            self.console.print(
+                f"\n[yellow]⏹ Cancelled - partial answer {'kept in' if keep and response_text else 'dropped from'} history[/yellow]"
+            )
+            return (response_text if keep else ""), True
+        finally:
+            # Also when streaming raised (e.g. applying a diff): the worker mustn't keep decoding unread
+            handle.cancel()
+            handle.wait()
+    
+    def edit_turn(self, user_input: str) -> str:
+        """
+        Ask for a unified diff against the attached files and apply it locally
+        
+        The diff is parsed as it streams and each file's patch is checked as
+        soon as it is complete. If one doesn't apply, generation stops there
+        and the request is repeated asking for the full files instead.
+        """
+        from rich.syntax import Syntax
+        from diffs import DiffStreamParser, PatchError
+        
+        staged = dict(self.edits.pending)
+        applied, errors = [], []
+        
+        def watch(handle):
+            def on_file(patch):
+                if errors:
+                    return
+                try:
+                    applied.append(self.edits.apply(patch))
+                except PatchError as e:
+                    errors.append(str(e))
+                    handle.cancel()  # The rest of the diff is wasted work
+            return DiffStreamParser(on_file).watch(handle)
+        
+        prompt = self.context_mgr.build_prompt_tokens(user_input, attachment=self.edits.prompt_prefix())
+        response_text, cancelled = self.generate(prompt, watch)
+        if cancelled:
+            self.edits.pending = staged
+            return response_text
+        if not applied and not errors:
+            if "@@" not in response_text:
+                return response_text  # A plain answer, e.g. a question about the code
+            errors.append("no complete hunks in the diff")
+        
+        metrics = self.model.last_metrics
+        if not errors:
+            full_tokens = sum(self.context_mgr.count_tokens(self.edits.pending[path]) for path, _ in applied)
+            saved = max(0, full_tokens - metrics.output_tokens)
+            self.model.metrics.record_edit(metrics, applied=True, saved_tokens=saved)
+            self.console.print("\n[cyan]Patched result:[/cyan]")
+            for _, diff in applied:
+                self.console.print(Syntax(diff, "diff", theme="ansi_dark"))
+            self.console.print(
+                f"[green]✓ Diff applies to {', '.join(path for path, _ in applied)}[/green] "
+                f"(~{saved} output tokens saved) - /apply to write"
+            )
+            return response_text
+        
+        # Fall back to complete files
+        self.edits.pending = staged
+        self.model.metrics.record_edit(metrics, applied=False, saved_tokens=0)
+        self.console.print(f"\n[yellow]⚠️  Diff didn't apply: {errors[0]}[/yellow]")
+        if not self.model.config.get('edit', {}).get('fallback_full_output', True):
+            return response_text
+        self.console.print("[yellow]Asking for the full files instead[/yellow]")
+        self.console.print("\n🤖 Orbit:", style="bold cyan")
+        prompt = self.context_mgr.build_prompt_tokens(
+            user_input, attachment=self.edits.prompt_prefix(full_output=True)
+        )
+        response_text, cancelled = self.generate(prompt)
+        if not cancelled:
+            paths = self.edits.apply_full_output(response_text)
+            if paths:
+                self.console.print(f"[green]✓ Staged {', '.join(paths)}[/green] - /apply to write")
+        return response_text
+    
     def chat_loop(self):
         """Main chat loop"""
+        from prompt_toolkit.patch_stdout import patch_stdout
+        
+        prefill = None
         while True:
             try:
-                # Get user input
-                user_input = self.session.prompt("\n💬 You: ")
+                # Get user input (background output, e.g. warm-up, prints above the prompt)
+                prefill = self.start_prefill()
+                with patch_stdout():
+                    user_input = self.session.prompt("\n💬 You: ")
                 
+                # Commands (/clear, /model, /load...) may invalidate the prefilled prefix, and
+                # /save, /load and /model touch the llama context, so the prefill must have stopped
+                if prefill is not None and (not user_input.strip() or user_input.startswith("/")):
+                    prefill.cancel()
+                    prefill.wait()
                 if not user_input.strip():
                     continue
                 
+                # A background summary either finished while the user typed or stops now
+                self.summarizer.collect()
+                if self.reload_config() and prefill is not None:
+                    prefill.cancel()
+                    prefill.wait()
+                
                 # Handle commands
                 if user_input.startswith("/"):
                     if not self.handle_command(user_input):
                         break
                     continue
                 
-                # Build prompt with context
-                prompt = self.context_mgr.build_prompt(user_input)
+                # Generate with context (edit mode attaches files and expects a diff)
+                self.console.print("\n🤖 Orbit:", style="bold cyan")
+                if self.edits.active:
+                    response_text = self.edit_turn(user_input)
+                else:
+                    prompt = self.context_mgr.build_prompt_tokens(user_input)
+                    response_text, _ = self.generate(prompt)
+                if not response_text:
+                    continue
                 
-                # Add to history
+                # The turn is recorded only once it has an answer
                 self.context_mgr.add_to_history("user", user_input)
-                
-                # Generate response with streaming
-                self.console.print("\n🤖 Orbit: ", end="", style="bold cyan")
-                
-                response_text = ""
-                for token in self.model.generate(prompt, stream=True):
-                    self.console.print(token, end="")
-                    response_text += token
-                
-                self.console.print()  # Newline
-                
-                # Add response to history
                 self.context_mgr.add_to_history("assistant", response_text)
                 
+                # Fold turns about to be evicted into the summary while the user reads
+                self.summarizer.schedule(self.model.active_model)
+                
             except KeyboardInterrupt:
+                # Ctrl-C at the prompt: stop this prefill before the next one is queued
+                if prefill is not None:
+                    prefill.cancel()
+                    prefill.wait()
                 self.console.print("\n[yellow]Use /exit to quit[/yellow]")
                 continue
             except EOFError:
@@ -132,6 +502,10 @@ Just type your coding questions naturally!
             self.console.print("[yellow]⚠️  No contexts/ folder found. Creating example files...[/yellow]\n")
             self.create_example_contexts()
         
+        # Load the model while the user types their first question
+        if self.model.config['performance'].get('eager_load', False):
+            self.model.start_warmup(self.context_mgr.build_system_tokens)
+        
         # Start chat loop
         self.chat_loop()
     
@@ -169,8 +543,84 @@ Just type your coding questions naturally!
         self.console.print("[cyan]Edit them to customize Orbit for your project![/cyan]\n")
 
 
+def _is_gguf(path: Path) -> bool:
+    """True if path starts with the GGUF magic bytes"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(4) == b"GGUF"
+    except OSError:
+        return False
+
+
+def check(config_path: str = "config.yaml") -> bool:
+    """
+    Report whether Orbit can start: config, model files, context and dependencies
+    
+    Never imports llama_cpp (that alone takes seconds); dependencies are
+    only located on the import path.
+    """
+    import importlib.util
+    from config import SharedConfig
+    
+    print(f"🌍 Orbit {__version__} (Python {sys.version.split()[0]})")
+    ok = True
+    
+    for module in ("llama_cpp", "yaml", "rich", "prompt_toolkit", "gradio"):
+        found = importlib.util.find_spec(module) is not None
+        print(f"  {'✅' if found else '❌'} {module}")
+        ok = ok and (found or module == "gradio")  # gradio is only needed for the web UI
+    
+    try:
+        config = SharedConfig.load(config_path).data
+    except Exception as e:
+        print(f"  ❌ {config_path}: {e}")
+        return False
+    print(f"  ✅ {config_path}")
+    
+    for entry in [config['model']] + (config.get('models') or []):
+        if entry.get('backend') == 'stub':
+            continue
+        path = Path(entry['path'])
+        if _is_gguf(path):
+            from memory import model_shape
+            shape = model_shape(str(path))
+            dims = f", {shape.n_layer} layers, {shape.n_head_kv} KV heads" if shape else ""
+            print(f"  ✅ {entry['name']}: {path} ({path.stat().st_size / 1e9:.1f} GB{dims})")
+        else:
+            print(f"  ❌ {entry['name']}: {path} {'is not a GGUF file' if path.exists() else 'not found'}")
+            ok = False
+    
+    for name in ("system.txt", "project.txt", "conventions.txt"):
+        exists = (Path("contexts") / name).exists()
+        print(f"  {'✅' if exists else '⚠️ '} contexts/{name}")
+    
+    return ok
+
+
 def main():
     """Entry point"""
+    if len(sys.argv) > 1 and sys.argv[1] in ("--version", "-V"):
+        print(f"Orbit {__version__}")
+        return
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "--check":
+        sys.exit(0 if check(*sys.argv[2:3]) else 1)
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        from bench import main as bench_main
+        bench_main(sys.argv[2:])
+        return
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from batch import main as batch_main
+        batch_main(sys.argv[2:])
+        return
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "tune":
+        from tune import main as tune_main
+        tune_main(sys.argv[2:])
+        return
+    
     orbit = Orbit()
     orbit.run()
 
@@ -1,73 +1,240 @@
 """Orbit Web UI - Simple Chat Interface"""
-import gradio as gr
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+from config import SharedConfig, describe
 from model import OrbitModel
 from context import ContextManager
+from file_cache import FileCache
+from retrieval import create_index
+from scheduler import QueueFullError, RequestScheduler
+from streaming import StreamBuffer
 
 
-# Initialize
-model = OrbitModel()
-context_manager = ContextManager()
+class WebSession:
+    """One browser session's conversation and model choice"""
+    
+    def __init__(self, context_mgr: ContextManager, model_name: str):
+        self.context_mgr = context_mgr
+        self.model_name = model_name
+        self.last_used = time.monotonic()
 
 
-def respond(message, history, template_choice, use_project_context):
-    """Generate response with streaming"""
-    # Set template
-    if template_choice != "None":
-        context_manager.load_template(template_choice)
-    else:
-        context_manager.current_template = None
+class SessionStore:
+    """Per-browser-session state, so tabs don't share history, templates or models"""
+    
+    def __init__(self, model: OrbitModel, config_path: str = "config.yaml", max_sessions: int = 32, ttl: float = 3600):
+        self.model = model
+        self.config_path = config_path
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.file_cache = FileCache()  # Context files are shared, conversations are not
+        self.code_index = create_index(model.config)
+        self._sessions: "OrderedDict[str, WebSession]" = OrderedDict()
+        self._lock = threading.Lock()
     
-    # Build prompt
-    override = not use_project_context
-    prompt = context_manager.build_prompt(message, override_project_context=override)
+    def get(self, session_id: str) -> WebSession:
+        """Return the session's state, creating it on first use"""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.pop(session_id, None) or self._create()
+            session.last_used = now
+            self._sessions[session_id] = session
+            
+            # Drop idle sessions, then the least recently used beyond the cap
+            for sid, other in list(self._sessions.items()):
+                if now - other.last_used > self.ttl:
+                    del self._sessions[sid]
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            
+            return session
     
-    # Generate with streaming
-    response = ""
-    for token in model.generate(prompt, stream=True):
-        response += token
-        yield response
+    def _create(self) -> WebSession:
+        context_mgr = ContextManager(self.config_path, file_cache=self.file_cache, code_index=self.code_index)
+        session = WebSession(context_mgr, self.model.active_model)
+        self.set_model(session, session.model_name)
+        return session
+    
+    def set_model(self, session: WebSession, model_name: str):
+        """Point a session at another model, re-encoding its history for that vocabulary"""
+        session.model_name = model_name
+        session.context_mgr.set_tokenizer(
+            partial(self.model.tokenize, model_name=model_name), self.model.context_size(model_name), vocab=model_name
+        )
     
-    # Save to history
-    context_manager.add_to_history("user", message)
-    context_manager.add_to_history("assistant", response)
+    def __len__(self) -> int:
+        return len(self._sessions)
 
 
-# Build UI  
-with gr.Blocks(title="Orbit - Offline Coding Assistant") as app:
+def build_app(config_path: str = "config.yaml"):
+    """
+    Create the model, session store, scheduler and Gradio UI
     
-    gr.Markdown("# 🌍 Orbit - Offline Coding Assistant")
-    gr.Markdown("**Context-aware code generation • 100% offline • Privacy-first**")
+    Nothing heavy happens at import time; gradio is imported here and
+    llama_cpp on the first model load. With web.workers > 1, generation
+    runs in a WorkerPool of model processes and this process only builds
+    prompts (tokenizing with a vocab-only model).
+    """
+    import gradio as gr
     
-    # Settings Row
-    with gr.Row():
-        template = gr.Dropdown(
-            choices=["None"] + context_manager.list_templates(),
-            value="None",
-            label="Template",
-            scale=2
-        )
-        use_context = gr.Checkbox(
-            value=True,
-            label="Use Project Context",
-            scale=1
+    web_config = SharedConfig.load(config_path).data.get('web', {})
+    workers = web_config.get('workers', 1)
+    model = OrbitModel(config_path, processes=workers)
+    pool = None
+    if workers > 1:
+        from pool import WorkerPool
+        pool = WorkerPool(config_path, workers, max_sessions=web_config.get('max_sessions', 32))
+        pool.start(model.metrics)
+    sessions = SessionStore(
+        model,
+        config_path,
+        max_sessions=web_config.get('max_sessions', 32),
+        ttl=web_config.get('session_ttl', 3600),
+    )
+    scheduler = RequestScheduler(
+        max_queue=web_config.get('max_queue', 8),
+        max_per_session=web_config.get('max_per_session', 1),
+        slots=workers,
+    )
+    
+    if pool is None and model.config['performance'].get('eager_load', False):
+        model.start_warmup()
+    
+    def respond(message, history, model_choice, template_choice, use_project_context, request: gr.Request):
+        """Generate response with streaming"""
+        # Pick up config.yaml edits (generation/context apply now, weights reload only if needed)
+        for line in describe(model.shared_config.check()):
+            print(f"🔄 config.yaml: {line}")
+        
+        session_id = request.session_hash if request else "default"
+        session = sessions.get(session_id)
+        context_manager = session.context_mgr
+        
+        if model_choice != session.model_name:
+            sessions.set_model(session, model_choice)
+        
+        # The chat was cleared in the browser - start this session afresh
+        if not history:
+            context_manager.clear_history()
+        
+        # Set template
+        if template_choice != "None":
+            context_manager.load_template(template_choice)
+        else:
+            context_manager.current_template = None
+        
+        # Wait for our turn on the model
+        try:
+            ticket = scheduler.submit(session_id)
+        except QueueFullError as e:
+            raise gr.Error(str(e))
+        
+        try:
+            while not scheduler.wait(ticket, timeout=1.0):
+                yield f"⏳ Waiting for the model... (position {scheduler.position(ticket)} in queue)"
+            
+            # Build prompt
+            override = not use_project_context
+            prompt = context_manager.build_prompt_tokens(message, override_project_context=override)
+            
+            # Generate with streaming, redrawing at most stream_fps times a second
+            response = ""
+            buffer = StreamBuffer(model.config.get('display', {}).get('stream_fps', 15))
+            if pool is not None:
+                handle = pool.submit(session_id, prompt, model_name=session.model_name)
+            else:
+                handle = model.submit(prompt, model_name=session.model_name)
+            try:
+                for response in buffer.frames(handle):
+                    yield response
+            except GeneratorExit:
+                # Stop pressed or the tab closed - free the model within one token
+                handle.cancel()
+                handle.wait()
+                if model.config['generation'].get('on_cancel', 'keep') == 'keep' and handle.text():
+                    context_manager.add_to_history("user", message)
+                    context_manager.add_to_history("assistant", handle.text())
+                raise
+        finally:
+            scheduler.release(ticket)
+        
+        # Save to history
+        context_manager.add_to_history("user", message)
+        context_manager.add_to_history("assistant", response)
+    
+    def queue_status() -> str:
+        """One-line scheduler readout"""
+        stats = scheduler.stats()
+        if model.is_warming_up:
+            state = "🔵 warming up"
+        else:
+            state = "🟠 busy" if stats['busy'] else "🟢 idle"
+        if pool is not None:
+            state += f" ({stats['active']}/{workers} workers)"
+        ttft = model.metrics.summary()['ttft_s']
+        return (
+            f"Model: {state} • Queued: {stats['queued']} • Sessions: {len(sessions)} • "
+            f"Avg wait: {stats['avg_wait_s']:.1f}s (max {stats['max_wait_s']:.1f}s) • "
+            f"Rejected: {stats['rejected']} • TTFT p50/p95: {ttft['p50']:.1f}s/{ttft['p95']:.1f}s"
         )
     
-    # Chat Interface (Gradio 6.x compatible - no retry_btn, undo_btn, or clear_btn)
-    chat_interface = gr.ChatInterface(
-        fn=respond,
-        additional_inputs=[template, use_context],
-        chatbot=gr.Chatbot(height=550),
-        textbox=gr.Textbox(
-            placeholder="Ask anything... (e.g., 'Create a FastAPI login endpoint')",
-            container=False
+    # Build UI
+    with gr.Blocks(title="Orbit - Offline Coding Assistant") as app:
+        
+        gr.Markdown("# 🌍 Orbit - Offline Coding Assistant")
+        gr.Markdown("**Context-aware code generation • 100% offline • Privacy-first**")
+        
+        # Settings Row
+        with gr.Row():
+            model_select = gr.Dropdown(
+                choices=model.list_models(),
+                value=model.active_model,
+                label="Model",
+                scale=2
+            )
+            template = gr.Dropdown(
+                choices=["None"] + sessions.get("default").context_mgr.list_templates(),
+                value="None",
+                label="Template",
+                scale=2
+            )
+            use_context = gr.Checkbox(
+                value=True,
+                label="Use Project Context",
+                scale=1
+            )
+        
+        # Chat Interface (Gradio 6.x compatible - no retry_btn, undo_btn, or clear_btn)
+        # Concurrency is left to the RequestScheduler so it can apply fair sharing
+        chat_interface = gr.ChatInterface(
+            fn=respond,
+            additional_inputs=[model_select, template, use_context],
+            chatbot=gr.Chatbot(height=550),
+            textbox=gr.Textbox(
+                placeholder="Ask anything... (e.g., 'Create a FastAPI login endpoint')",
+                container=False
+            ),
+            concurrency_limit=None,
         )
-    )
+        
+        # Queue readout, refreshed every couple of seconds
+        status = gr.Markdown(queue_status())
+        gr.Timer(2.0).tick(queue_status, outputs=status)
+        
+        gr.Markdown("---\n🔒 **Privacy First** • Your code never leaves your machine")
     
-    gr.Markdown("---\n🔒 **Privacy First** • Your code never leaves your machine")
+    return app
 
 
-if __name__ == "__main__":
+def main():
+    """Entry point for `python orbit_web.py`"""
+    import gradio as gr
+    
     print("🌍 Orbit - Starting...")
+    app = build_app()
     print("🌐 Opening at: http://127.0.0.1:7860\n")
     
     app.launch(
@@ -75,4 +242,8 @@ if __name__ == "__main__":
         server_port=7860,
         inbrowser=True,
         theme=gr.themes.Soft()  # Theme parameter goes in launch() for Gradio 6.x
-    )
\ No newline at end of file
+    )
+
+
+if __name__ == "__main__":
+    main()
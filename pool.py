@@ -0,0 +1,271 @@
+"""Multi-process worker pool: one llama.cpp context per process for concurrent web sessions"""
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Union
+
+from config import describe
+from metrics import MetricsRecorder
+from worker import GenerationHandle
+
+
+def _worker_main(index: int, config_path: str, processes: int, requests, results, cancels):
+    """
+    Worker process: load the model once, then serve requests until None arrives
+
+    Tokens go back on the shared results queue as (request_id, "token", text)
+    and each request ends with (request_id, "done", (error, metrics)).
+    Cancel requests arrive on this worker's own queue and are checked
+    after every token.
+    """
+    from model import OrbitModel
+
+    model = OrbitModel(config_path, processes=processes)
+    model.metrics = MetricsRecorder(window=1)  # The pool records metrics (and exports them) in the parent
+    model.get_llm()
+    results.put((None, "ready", index))
+
+    cancelled = set()
+
+    def poll_cancels():
+        while True:
+            try:
+                cancelled.add(cancels.get_nowait())
+            except queue.Empty:
+                return
+
+    while True:
+        job = requests.get()
+        if job is None:
+            return
+        request_id, prompt, model_name, kwargs = job
+        for line in describe(model.shared_config.check()):
+            print(f"🔄 worker {index}: config.yaml: {line}")
+
+        poll_cancels()
+        previous = model.last_metrics
+        stream = None
+        error = None
+        try:
+            if request_id not in cancelled:  # Cancelled while still queued
+                stream = model.generate(prompt, stream=True, model_name=model_name, **kwargs)
+                for text in stream:
+                    results.put((request_id, "token", text))
+                    poll_cancels()
+                    if request_id in cancelled:
+                        break
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            if stream is not None:
+                stream.close()  # GeneratorExit inside generate() stops the decode
+        metrics = model.last_metrics if model.last_metrics is not previous else None
+        results.put((request_id, "done", (error, metrics)))
+        cancelled.discard(request_id)
+
+
+class PoolHandle(GenerationHandle):
+    """A request running in a pool worker; cancel() is forwarded to its process"""
+
+    def __init__(self, pool: "WorkerPool", request_id: int, worker: int):
+        super().__init__(job=None)
+        self.pool = pool
+        self.request_id = request_id
+        self.worker = worker
+
+    def cancel(self):
+        """Ask the worker process to stop this request at the next token boundary"""
+        if not self.cancelled and not self.wait(0):
+            self.pool._cancels[self.worker].put(self.request_id)
+        super().cancel()
+
+
+class WorkerPool:
+    """
+    N model processes, each with its own llama.cpp context
+
+    Weights are mmap'd, so the processes share one copy of them in the page
+    cache; each has its own KV cache and a 1/N share of the threads
+    (OrbitModel(processes=N)). Requests are routed with session affinity:
+    a session sticks to the worker that served it first, so its prompt
+    prefix stays warm in that worker's KV cache. New sessions go to the
+    least loaded worker, and so does a session whose worker is busy while
+    another one is idle (losing the warm prefix beats leaving a core idle). Streamed tokens are relayed back by one thread
+    into PoolHandles, which behave like GenerationWorker handles.
+    """
+
+    def __init__(self, config_path: str = "config.yaml", workers: int = 2, max_sessions: int = 256):
+        self.config_path = config_path
+        self.workers = workers
+        self.max_sessions = max_sessions
+        self.metrics: Optional[MetricsRecorder] = None
+        self._context = multiprocessing.get_context("spawn")  # Don't fork a process that holds threads and a model
+        self._processes: List[multiprocessing.Process] = []
+        self._requests: List = []
+        self._cancels: List = []
+        self._results = None
+        self._relay: Optional[threading.Thread] = None
+        self._handles: Dict[int, PoolHandle] = {}
+        self._in_flight: List[int] = [0] * workers
+        self._affinity: "OrderedDict[str, int]" = OrderedDict()  # session_id -> worker, LRU order
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self, metrics: Optional[MetricsRecorder] = None, timeout: Optional[float] = None):
+        """Spawn the workers and wait until each has loaded the model"""
+        self.metrics = metrics or MetricsRecorder()
+        self._results = self._context.Queue()
+        for index in range(self.workers):
+            requests, cancels = self._context.Queue(), self._context.Queue()
+            process = self._context.Process(
+                target=_worker_main,
+                args=(index, self.config_path, self.workers, requests, self._results, cancels),
+                name=f"orbit-worker-{index}",
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+            self._requests.append(requests)
+            self._cancels.append(cancels)
+
+        started = time.perf_counter()
+        ready = set()
+        while len(ready) < self.workers:
+            try:
+                _, _, index = self._results.get(timeout=0.5)
+                ready.add(index)
+            except queue.Empty:
+                dead = [p.name for p in self._processes if not p.is_alive()]
+                if dead:
+                    self.close()
+                    raise RuntimeError(f"{', '.join(dead)} exited while loading the model")
+                if timeout is not None and time.perf_counter() - started > timeout:
+                    self.close()
+                    raise TimeoutError(f"Worker pool not ready after {timeout:.0f}s")
+        print(f"✅ Worker pool ready: {self.workers} processes ({time.perf_counter() - started:.1f}s)")
+
+        self._relay = threading.Thread(target=self._relay_results, name="orbit-pool-relay", daemon=True)
+        self._relay.start()
+
+    def worker_for(self, session_id: str) -> int:
+        """The worker serving a session (assigning the least loaded one on first use)"""
+        with self._lock:
+            return self._assign(session_id)
+
+    def _assign(self, session_id: str) -> int:
+        """Sticky worker for a session, re-pinned if its worker died or is busy while another idles (lock held)"""
+        alive = [w for w, process in enumerate(self._processes) if process.is_alive()]
+        if not alive:
+            raise RuntimeError("All pool workers have exited")
+        pinned = self._affinity.get(session_id)
+        idle = [w for w in alive if self._in_flight[w] == 0]
+        if pinned in alive and (self._in_flight[pinned] == 0 or not idle):
+            self._affinity.move_to_end(session_id)
+            return pinned
+
+        sessions = [0] * self.workers
+        for worker in self._affinity.values():
+            sessions[worker] += 1
+        worker = min(alive, key=lambda w: (self._in_flight[w], sessions[w]))
+        self._affinity[session_id] = worker
+        while len(self._affinity) > self.max_sessions:
+            self._affinity.popitem(last=False)
+        return worker
+
+    def submit(
+        self,
+        session_id: str,
+        prompt: Union[str, List[int]],
+        model_name: Optional[str] = None,
+        **kwargs,
+    ) -> PoolHandle:
+        """
+        Stream a generation on the session's worker
+
+        Iterate the returned handle for tokens; cancel(), wait() and text()
+        work as for OrbitModel.submit. kwargs go to generate (max_tokens,
+        background).
+        """
+        with self._lock:
+            worker = self._assign(session_id)
+            handle = PoolHandle(self, next(self._ids), worker)
+            self._handles[handle.request_id] = handle
+            self._in_flight[worker] += 1
+        self._requests[worker].put((handle.request_id, prompt, model_name, kwargs))
+        return handle
+
+    def _relay_results(self):
+        """Move tokens from the shared results queue into their handles"""
+        while True:
+            self._fail_dead_workers()  # Every pass: other workers' tokens mustn't hide a dead one
+            try:
+                request_id, kind, payload = self._results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return  # Closed
+            if request_id is None:
+                return
+
+            handle = self._handles.get(request_id)
+            if handle is None:
+                continue
+            if kind == "token":
+                handle.put(payload)
+                continue
+
+            error, metrics = payload
+            self._finish(handle)
+            if metrics is not None:
+                self.metrics.record(metrics)
+            handle.finish(RuntimeError(error) if error else None)
+
+    def _finish(self, handle: PoolHandle):
+        with self._lock:
+            self._handles.pop(handle.request_id, None)
+            self._in_flight[handle.worker] -= 1
+
+    def _fail_dead_workers(self):
+        """End the requests of a worker process that died (e.g. killed for memory); its sessions move on next use"""
+        for index, process in enumerate(self._processes):
+            if process.is_alive():
+                continue
+            with self._lock:
+                orphans = [h for h in self._handles.values() if h.worker == index]
+                for session_id in [s for s, w in self._affinity.items() if w == index]:
+                    del self._affinity[session_id]
+            for handle in orphans:
+                self._finish(handle)
+                handle.finish(RuntimeError(f"{process.name} exited (code {process.exitcode})"))
+
+    def stats(self) -> Dict[str, object]:
+        """Per-worker load for display"""
+        with self._lock:
+            sessions = [0] * self.workers
+            for worker in self._affinity.values():
+                sessions[worker] += 1
+            return {
+                "workers": self.workers,
+                "alive": sum(p.is_alive() for p in self._processes),
+                "in_flight": list(self._in_flight),
+                "sessions": sessions,
+            }
+
+    def close(self):
+        """Stop the workers (running requests are abandoned)"""
+        for requests in self._requests:
+            requests.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        if self._results is not None:
+            self._results.put((None, "closed", None))
+        if self._relay is not None:
+            self._relay.join(timeout=5)
+        self._processes.clear()
+        self._requests.clear()
+        self._cancels.clear()
@@ -0,0 +1,103 @@
+"""On-disk KV-state snapshots for Orbit's static system prefix"""
+import hashlib
+import os
+from array import array
+import pickle
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+
+# Bytes hashed from each end of the model file for its fingerprint
+_FINGERPRINT_CHUNK = 1 << 20
+
+_fingerprints: Dict[Tuple[str, int, int], str] = {}
+
+
+def model_fingerprint(model_path: str) -> str:
+    """
+    Content hash identifying a GGUF file without reading all of it
+
+    Hashes the file size plus the first and last MiB (header metadata and
+    tail tensors), memoized per path/size/mtime so it's computed once.
+    """
+    path = Path(model_path).resolve()
+    stat = path.stat()
+    memo_key = (str(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _fingerprints:
+        digest = hashlib.sha256(str(stat.st_size).encode())
+        with open(path, 'rb') as f:
+            digest.update(f.read(_FINGERPRINT_CHUNK))
+            if stat.st_size > 2 * _FINGERPRINT_CHUNK:
+                f.seek(-_FINGERPRINT_CHUNK, os.SEEK_END)
+                digest.update(f.read(_FINGERPRINT_CHUNK))
+        _fingerprints[memo_key] = digest.hexdigest()[:16]
+    return _fingerprints[memo_key]
+
+
+class PrefixCache:
+    """Directory of pickled llama states with a size cap and LRU eviction"""
+
+    SUFFIX = ".state"
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(model_id: str, prefix_tokens: Sequence[int], n_ctx: int, n_batch: int) -> str:
+        """Key a snapshot by model file, prefix token IDs and context geometry"""
+        digest = hashlib.sha256(f"{model_id}:{n_ctx}:{n_batch}:".encode('utf-8'))
+        digest.update(array('i', prefix_tokens).tobytes())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{self.SUFFIX}"
+
+    def load(self, key: str) -> Optional[Any]:
+        """Return the stored state for key, or None on a miss"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Truncated or stale snapshot - drop it and re-evaluate
+            path.unlink(missing_ok=True)
+            return None
+
+        # Touch so LRU eviction sees this entry as recently used
+        os.utime(path)
+        return state
+
+    def save(self, key: str, state: Any):
+        """Store state for key, then evict old snapshots over the size cap"""
+        path = self._path(key)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        if tmp_path.stat().st_size > self.max_bytes:
+            tmp_path.unlink(missing_ok=True)  # Alone over the cap - it would only evict everything else
+            return
+        os.replace(tmp_path, path)
+        self._evict(keep=path)
+
+    def _evict(self, keep: Path):
+        """Delete least recently used snapshots until under max_bytes"""
+        entries = []
+        for path in self.cache_dir.glob(f"*{self.SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,89 @@
+"""Persistent cache of deterministic generations, stored in SQLite"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+
+class ResponseCache:
+    """
+    Maps (model, prompt, generation parameters) -> streamed response chunks
+
+    Only meant for deterministic sampling, where the same key always
+    produces the same text. Total stored size is capped; the least recently
+    used responses are evicted first.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " chunks TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_used)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(model_id: str, prompt_ids: Sequence[int], params: dict) -> str:
+        """Hash of the model, exact prompt tokens and every sampling parameter"""
+        digest = hashlib.sha256(model_id.encode('utf-8'))
+        digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+        digest.update(array('i', prompt_ids).tobytes())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """Return the cached chunks for key, or None on a miss"""
+        with self._lock:
+            row = self._db.execute("SELECT chunks FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key: str, chunks: List[str]):
+        """Store a finished response, then evict down to the size cap"""
+        payload = json.dumps(chunks)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, chunks, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now),
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Delete least recently used rows until under max_bytes (lock held)"""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def stats(self) -> dict:
+        """Hit/miss counters and stored size"""
+        with self._lock:
+            count, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": count, "bytes": size}
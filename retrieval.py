@@ -0,0 +1,285 @@
+"""Lexical (BM25) retrieval of repository code chunks, with optional embeddings"""
+import fnmatch
+import math
+import os
+import pickle
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+_STOPWORDS = {
+    "the", "and", "for", "with", "this", "that", "from", "into", "are", "was", "not",
+    "self", "def", "return", "import", "none", "true", "false", "class", "if", "else",
+    "in", "is", "to", "of", "a", "an", "it", "be", "or", "as", "on", "at", "by",
+}
+
+# Index file format version - bump when the pickled structure changes
+_INDEX_VERSION = 2
+
+
+def terms(text: str) -> List[str]:
+    """Split code/text into search terms: whole identifiers plus their snake/camel parts"""
+    result = []
+    for identifier in _IDENTIFIER_RE.findall(text):
+        lowered = identifier.lower()
+        parts = [p.lower() for piece in identifier.split('_') for p in _CAMEL_RE.findall(piece)]
+        for term in {lowered, *parts}:
+            if len(term) > 1 and term not in _STOPWORDS:
+                result.append(term)
+    return result
+
+
+class CodeIndex:
+    """
+    Chunks a source tree into overlapping line windows and ranks them with BM25
+
+    The index is updated incrementally: only files whose mtime/size changed
+    are re-chunked, and it is persisted so a restart doesn't rebuild it.
+    """
+
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(
+        self,
+        root: str,
+        include: List[str],
+        exclude: List[str],
+        chunk_lines: int = 40,
+        chunk_overlap: int = 10,
+        index_path: Optional[str] = None,
+        refresh_interval: float = 30.0,
+        embedder=None,
+        embedding_weight: float = 0.5,
+    ):
+        self.root = Path(root)
+        self.include = include
+        self.exclude = set(exclude)
+        self.chunk_lines = chunk_lines
+        self.step = max(1, chunk_lines - chunk_overlap)
+        self.index_path = Path(index_path) if index_path else None
+        self.refresh_interval = refresh_interval
+        self.embedder = embedder  # Callable[[str], List[float]] or None
+        self.embedding_weight = embedding_weight
+
+        self.files: Dict[str, Tuple[int, int]] = {}      # path -> (mtime_ns, size)
+        self.file_chunks: Dict[str, List[int]] = {}      # path -> chunk ids
+        self.chunks: Dict[int, dict] = {}                # id -> {path, start, end, text, length, terms}
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)  # term -> {chunk id: tf}
+        self.vectors: Dict[int, List[float]] = {}        # chunk id -> embedding (lazy)
+        self.total_length = 0
+        self._next_id = 0
+        self._last_refresh = 0.0
+        self._lock = threading.RLock()  # Web sessions share one index
+
+        self._load()
+
+    def _load(self):
+        """Restore a persisted index if it matches this configuration"""
+        if self.index_path is None or not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, 'rb') as f:
+                saved = pickle.load(f)
+        except Exception:
+            return
+        if saved.get("version") != _INDEX_VERSION or saved.get("settings") != self._settings():
+            return
+        for name in ("files", "file_chunks", "chunks", "vectors", "total_length", "_next_id"):
+            setattr(self, name, saved[name])
+        self.postings = defaultdict(dict, saved["postings"])
+
+    def _save(self):
+        if self.index_path is None:
+            return
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({
+                "version": _INDEX_VERSION,
+                "settings": self._settings(),
+                "files": self.files,
+                "file_chunks": self.file_chunks,
+                "chunks": self.chunks,
+                "postings": dict(self.postings),
+                "vectors": self.vectors,
+                "total_length": self.total_length,
+                "_next_id": self._next_id,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.index_path)
+
+    def _settings(self) -> tuple:
+        return (str(self.root.resolve()), self.chunk_lines, self.step)
+
+    def _source_files(self) -> Dict[str, Tuple[int, int]]:
+        """Walk the tree and return {relative path: (mtime_ns, size)} for included files"""
+        found = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d not in self.exclude and not d.startswith('.')]
+            for filename in filenames:
+                if not any(fnmatch.fnmatch(filename, pattern) for pattern in self.include):
+                    continue
+                path = Path(dirpath) / filename
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                found[str(path.relative_to(self.root))] = (stat.st_mtime_ns, stat.st_size)
+        return found
+
+    def refresh(self, force: bool = False) -> int:
+        """
+        Re-index files that changed since the last refresh
+
+        Throttled to once per refresh_interval unless forced.
+
+        Returns:
+            Number of files (re)indexed or removed
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_refresh < self.refresh_interval:
+                return 0
+            self._last_refresh = now
+
+            current = self._source_files()
+            changed = [p for p, sig in current.items() if self.files.get(p) != sig]
+            removed = [p for p in self.files if p not in current]
+
+            for path in removed + changed:
+                self._remove_file(path)
+            for path in changed:
+                self._add_file(path, current[path])
+
+            if changed or removed:
+                self._save()
+            return len(changed) + len(removed)
+
+    def _remove_file(self, path: str):
+        for chunk_id in self.file_chunks.pop(path, []):
+            chunk = self.chunks.pop(chunk_id)
+            self.total_length -= chunk["length"]
+            self.vectors.pop(chunk_id, None)
+            for term in chunk["terms"]:
+                postings = self.postings.get(term)
+                if postings is not None:
+                    postings.pop(chunk_id, None)
+                    if not postings:
+                        del self.postings[term]
+        self.files.pop(path, None)
+
+    def _add_file(self, path: str, signature: Tuple[int, int]):
+        try:
+            lines = (self.root / path).read_text(encoding='utf-8').splitlines()
+        except (OSError, UnicodeDecodeError):
+            return
+
+        chunk_ids = []
+        for start in range(0, max(len(lines), 1), self.step):
+            text = "\n".join(lines[start:start + self.chunk_lines])
+            if not text.strip():
+                continue
+            counts = Counter(terms(text) + terms(path))
+            chunk_id = self._next_id
+            self._next_id += 1
+            self.chunks[chunk_id] = {
+                "path": path,
+                "start": start + 1,
+                "end": min(start + self.chunk_lines, len(lines)),
+                "text": text,
+                "length": sum(counts.values()),
+                "terms": list(counts),  # Exactly the postings to remove again (text and path terms)
+            }
+            self.total_length += self.chunks[chunk_id]["length"]
+            for term, tf in counts.items():
+                self.postings[term][chunk_id] = tf
+            chunk_ids.append(chunk_id)
+            if start + self.chunk_lines >= len(lines):
+                break
+
+        self.file_chunks[path] = chunk_ids
+        self.files[path] = signature
+
+    def search(self, query: str, top_k: int = 5) -> List[dict]:
+        """Return the top_k chunks for query, best first"""
+        self.refresh()
+        with self._lock:
+            if not self.chunks:
+                return []
+
+            n_chunks = len(self.chunks)
+            avg_length = self.total_length / n_chunks
+            scores: Dict[int, float] = defaultdict(float)
+            for term in set(terms(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_chunks - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, tf in postings.items():
+                    length = self.chunks[chunk_id]["length"]
+                    norm = tf + self.K1 * (1 - self.B + self.B * length / avg_length)
+                    scores[chunk_id] += idf * tf * (self.K1 + 1) / norm
+
+            ranked = sorted(scores, key=scores.get, reverse=True)
+            if self.embedder is not None and ranked:
+                ranked = self._rerank(query, ranked[:top_k * 4], scores)
+            return [self.chunks[chunk_id] for chunk_id in ranked[:top_k]]
+
+    def _rerank(self, query: str, candidates: List[int], scores: Dict[int, float]) -> List[int]:
+        """Blend normalized BM25 with embedding similarity (chunk vectors are cached)"""
+        query_vec = self.embedder(query)
+        best = scores[candidates[0]] or 1.0
+        blended = {}
+        for chunk_id in candidates:
+            if chunk_id not in self.vectors:
+                self.vectors[chunk_id] = self.embedder(self.chunks[chunk_id]["text"])
+            similarity = _cosine(query_vec, self.vectors[chunk_id])
+            blended[chunk_id] = (1 - self.embedding_weight) * scores[chunk_id] / best + self.embedding_weight * similarity
+        return sorted(blended, key=blended.get, reverse=True)
+
+    def stats(self) -> dict:
+        return {"files": len(self.files), "chunks": len(self.chunks), "terms": len(self.postings)}
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def create_index(config: dict) -> Optional[CodeIndex]:
+    """Build the CodeIndex described by the `retrieval` config section, if enabled"""
+    retrieval_config = config.get('retrieval', {})
+    if not retrieval_config.get('enabled', False):
+        return None
+
+    embedder = None
+    if retrieval_config.get('embedding_model'):
+        from llama_cpp import Llama
+        embedding_llm = Llama(model_path=retrieval_config['embedding_model'], embedding=True, verbose=False)
+
+        def embedder(text: str) -> List[float]:
+            vector = embedding_llm.embed(text)
+            # Some models return per-token vectors; mean-pool them
+            if vector and isinstance(vector[0], list):
+                vector = [sum(column) / len(vector) for column in zip(*vector)]
+            return vector
+
+    cache_dir = Path(config.get('cache', {}).get('dir', '.orbit_cache'))
+    return CodeIndex(
+        root=retrieval_config.get('source_dir', '.'),
+        include=retrieval_config.get('include', ['*.py']),
+        exclude=retrieval_config.get('exclude', []),
+        chunk_lines=retrieval_config.get('chunk_lines', 40),
+        chunk_overlap=retrieval_config.get('chunk_overlap', 10),
+        index_path=str(cache_dir / "retrieval_index.pkl"),
+        refresh_interval=retrieval_config.get('refresh_interval', 30),
+        embedder=embedder,
+        embedding_weight=retrieval_config.get('embedding_weight', 0.5),
+    )
@@ -0,0 +1,135 @@
+"""Fair request scheduler for sharing one model between web sessions"""
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a request is refused by admission control"""
+
+
+class Ticket:
+    """A request waiting for (or holding) the model"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.enqueued_at = time.monotonic()
+        self.granted_at: Optional[float] = None
+
+    @property
+    def granted(self) -> bool:
+        return self.granted_at is not None
+
+
+class RequestScheduler:
+    """
+    Grants the model to one request at a time (or `slots` at a time, for a worker pool)
+
+    Waiting requests are grouped per session: FIFO within a session and
+    round-robin across sessions, so one busy tab can't starve the others.
+    Admission control rejects new requests once max_queue are waiting or
+    the session already has max_per_session requests queued.
+    """
+
+    def __init__(self, max_queue: int = 8, max_per_session: int = 1, slots: int = 1):
+        self.max_queue = max_queue
+        self.max_per_session = max_per_session
+        self.slots = slots
+        self._cond = threading.Condition()
+        self._queues: "OrderedDict[str, Deque[Ticket]]" = OrderedDict()
+        self._active: List[Ticket] = []
+        self._waiting = 0
+        self._rejected = 0
+        self._served = 0
+        self._recent_waits: Deque[float] = deque(maxlen=50)
+
+    def submit(self, session_id: str) -> Ticket:
+        """Queue a request, raising QueueFullError if it can't be admitted"""
+        with self._cond:
+            session_queue = self._queues.get(session_id)
+            if self._waiting >= self.max_queue or (
+                session_queue is not None and len(session_queue) >= self.max_per_session
+            ):
+                self._rejected += 1
+                raise QueueFullError("Orbit is busy - too many requests queued, try again shortly")
+
+            ticket = Ticket(session_id)
+            self._queues.setdefault(session_id, deque()).append(ticket)
+            self._waiting += 1
+            self._dispatch()
+            return ticket
+
+    def wait(self, ticket: Ticket, timeout: Optional[float] = None) -> bool:
+        """Block until ticket holds the model (True) or timeout expires (False)"""
+        with self._cond:
+            return self._cond.wait_for(lambda: ticket.granted, timeout=timeout)
+
+    def release(self, ticket: Ticket):
+        """Give up the model, or withdraw the ticket if it was still queued"""
+        with self._cond:
+            if ticket in self._active:
+                self._active.remove(ticket)
+            else:
+                session_queue = self._queues.get(ticket.session_id)
+                if session_queue is not None and ticket in session_queue:
+                    session_queue.remove(ticket)
+                    self._waiting -= 1
+                    if not session_queue:
+                        del self._queues[ticket.session_id]
+            self._dispatch()
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based place in line (0 once granted)"""
+        with self._cond:
+            if ticket.granted:
+                return 0
+            for place, queued in enumerate(self._service_order(), start=1):
+                if queued is ticket:
+                    return place
+            return 0
+
+    def _service_order(self) -> List[Ticket]:
+        """Order in which queued tickets will be served (round-robin over sessions)"""
+        queues = [list(q) for q in self._queues.values()]
+        order = []
+        depth = 0
+        while any(depth < len(q) for q in queues):
+            order.extend(q[depth] for q in queues if depth < len(q))
+            depth += 1
+        return order
+
+    def _dispatch(self):
+        """Hand free slots to the next sessions in round-robin order (lock held)"""
+        granted = False
+        while len(self._active) < self.slots and self._queues:
+            session_id, session_queue = next(iter(self._queues.items()))
+            ticket = session_queue.popleft()
+            if session_queue:
+                self._queues.move_to_end(session_id)
+            else:
+                del self._queues[session_id]
+
+            self._waiting -= 1
+            self._served += 1
+            ticket.granted_at = time.monotonic()
+            self._recent_waits.append(ticket.granted_at - ticket.enqueued_at)
+            self._active.append(ticket)
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, float]:
+        """Queue depth and recent wait times for display"""
+        with self._cond:
+            waits = list(self._recent_waits)
+            return {
+                "busy": len(self._active) >= self.slots,
+                "active": len(self._active),
+                "queued": self._waiting,
+                "sessions_waiting": len(self._queues),
+                "served": self._served,
+                "rejected": self._rejected,
+                "avg_wait_s": sum(waits) / len(waits) if waits else 0.0,
+                "max_wait_s": max(waits) if waits else 0.0,
+            }
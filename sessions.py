@@ -0,0 +1,164 @@
+"""Saved conversations: history plus the model's KV state, for instant resume
+
+File layout (`.orbit_cache/sessions/<name>.orbit`):
+
+    b"ORBS" | header length (4 bytes, big-endian) | JSON header | zlib(pickle(payload))
+
+The header names the model file fingerprint, context geometry and a
+SHA-256 of the compressed payload. The KV state is only restored when all
+of them match; otherwise the history is loaded as text and re-evaluated.
+"""
+import copy
+import hashlib
+import json
+import os
+import pickle
+import re
+import struct
+import zlib
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+
+MAGIC = b"ORBS"
+VERSION = 1
+_NAME_RE = re.compile(r"[\w.-]+")
+
+
+def compact_state(state):
+    """
+    Copy of a llama state without the bulk that resuming doesn't need
+
+    llama.cpp re-evaluates the last prompt token before sampling, so only
+    the last row of logits is kept (load_state broadcasts it back).
+    """
+    state = copy.copy(state)
+    scores = getattr(state, 'scores', None)
+    if scores is not None and len(scores) > 1:
+        state.scores = scores[-1:].copy()
+    return state
+
+
+class SavedSessions:
+    """Directory of saved conversations"""
+
+    SUFFIX = ".orbit"
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def _path(self, name: str) -> Path:
+        if not _NAME_RE.fullmatch(name):
+            raise ValueError(f"Invalid session name: {name!r} (use letters, digits, '.', '-', '_')")
+        return self.directory / f"{name}{self.SUFFIX}"
+
+    def list(self) -> List[str]:
+        """Saved session names, newest first"""
+        paths = sorted(self.directory.glob(f"*{self.SUFFIX}"), key=lambda p: p.stat().st_mtime, reverse=True)
+        return [p.stem for p in paths]
+
+    def save(self, name: str, context_mgr, model) -> Tuple[Path, int]:
+        """
+        Write the conversation and the active model's current KV state
+
+        Returns:
+            (path, file size in bytes)
+        """
+        model_name = model.active_model
+        state = model.save_state(model_name)
+        if state is not None:
+            state = compact_state(state)
+
+        payload = zlib.compress(pickle.dumps({
+            "history": context_mgr.conversation_history,
+            "summary": context_mgr.summary,
+            "state": state,
+        }, protocol=pickle.HIGHEST_PROTOCOL), 6)
+        header = json.dumps({
+            "version": VERSION,
+            "model": model_name,
+            "model_id": model.model_id(model_name),
+            "geometry": self._geometry(model, model_name),
+            "template": context_mgr.current_template,
+            "messages": len(context_mgr.conversation_history),
+            "state_tokens": getattr(state, 'n_tokens', 0),
+            "saved_at": datetime.now().isoformat(timespec="seconds"),
+            "sha256": hashlib.sha256(payload).hexdigest(),
+        }).encode('utf-8')
+
+        path = self._path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC + struct.pack(">I", len(header)) + header + payload)
+        os.replace(tmp_path, path)
+        return path, path.stat().st_size
+
+    def load(self, name: str, context_mgr, model) -> dict:
+        """
+        Restore a saved conversation into context_mgr (and model, if compatible)
+
+        Returns:
+            The file header plus "restored": whether the KV state was loaded,
+            and "reason" when it wasn't
+        """
+        path = self._path(name)
+        if not path.exists():
+            raise FileNotFoundError(f"No saved session named {name!r}")
+
+        data = path.read_bytes()
+        if data[:4] != MAGIC:
+            raise ValueError(f"{path} is not an Orbit session file")
+        try:
+            (header_len,) = struct.unpack(">I", data[4:8])
+            header = json.loads(data[8:8 + header_len])
+        except (struct.error, ValueError) as e:
+            raise ValueError(f"{path} is corrupt (unreadable header)") from e
+        payload = data[8 + header_len:]
+        if header.get("version") != VERSION:
+            raise ValueError(f"{path} has unsupported version {header.get('version')}")
+        if hashlib.sha256(payload).hexdigest() != header.get("sha256"):
+            raise ValueError(f"{path} is corrupt (checksum mismatch)")
+        try:
+            saved = pickle.loads(zlib.decompress(payload))
+        except Exception as e:
+            # zlib.error, UnpicklingError, EOFError... - report like the checks above
+            raise ValueError(f"{path} is corrupt ({type(e).__name__}: {e})") from e
+
+        # Continue on the model the session was saved with, if it's still registered
+        model_name = header["model"] if header["model"] in model.list_models() else model.active_model
+        model.use_model(model_name)
+
+        reason = self._incompatibility(header, model, model_name)
+        context_mgr.clear_history()
+        context_mgr.set_tokenizer(
+            partial(model.tokenize, model_name=model_name), model.context_size(model_name), vocab=model_name
+        )
+        context_mgr.current_template = header.get("template")
+        context_mgr.load_history(saved["history"], reencode=reason is not None, summary=saved.get("summary", ""))
+
+        restored = False
+        if reason is None and saved["state"] is not None:
+            model.load_state(saved["state"], model_name)
+            restored = True
+        elif saved["state"] is None:
+            reason = "no model state was saved"
+
+        return dict(header, model=model_name, restored=restored, reason=reason)
+
+    @staticmethod
+    def _geometry(model, model_name: str) -> dict:
+        return {
+            "n_ctx": model.context_size(model_name),
+            "n_batch": model.load_settings(model_name)['n_batch'],
+        }
+
+    def _incompatibility(self, header: dict, model, model_name: str) -> Optional[str]:
+        """Why the saved KV state can't be loaded into model_name, or None if it can"""
+        if header["model_id"] != model.model_id(model_name):
+            return "saved with a different model file"
+        if header["geometry"] != self._geometry(model, model_name):
+            return "context settings changed since it was saved"
+        return None
@@ -0,0 +1,125 @@
+"""Speculative decoding helpers: draft-model proposals and acceptance tracking"""
+from typing import Any, Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
+import llama_cpp
+from llama_cpp import Llama
+from llama_cpp.llama_speculative import LlamaDraftModel, LlamaPromptLookupDecoding
+
+
+class DraftModelDecoding(LlamaDraftModel):
+    """
+    Proposes tokens by greedy decoding with a small draft model
+
+    The draft GGUF must share the main model's vocabulary (e.g. a 0.5B/1.5B
+    model of the same family). Its KV cache is reused across calls by
+    matching the longest common prefix with the previous input.
+
+    The next token is read from the context's logits for the last evaluated
+    position, so the draft doesn't need logits_all (a n_ctx x n_vocab score
+    buffer); draft.scores only holds rows up to n_batch without it.
+    """
+
+    def __init__(self, draft: Llama, num_pred_tokens: int = 10):
+        self.draft = draft
+        self.num_pred_tokens = num_pred_tokens
+
+    def __call__(self, input_ids: npt.NDArray[np.intc], /, **kwargs: Any) -> npt.NDArray[np.intc]:
+        draft = self.draft
+        ids = input_ids.tolist()
+
+        # Keep what the draft has already evaluated; always re-evaluate the last token
+        common = 0
+        for a, b in zip(draft.input_ids[:draft.n_tokens], ids[:-1]):
+            if a != b:
+                break
+            common += 1
+        draft.n_tokens = common
+        draft.eval(ids[common:])
+
+        proposed = []
+        for _ in range(self.num_pred_tokens):
+            token = int(np.argmax(self._last_logits()))
+            if token == draft.token_eos() or draft.n_tokens >= draft.n_ctx():
+                break
+            proposed.append(token)
+            draft.eval([token])
+        return np.array(proposed, dtype=np.intc)
+
+    def _last_logits(self) -> npt.NDArray[np.single]:
+        """Logits after the most recently evaluated token, straight from the llama context"""
+        logits = llama_cpp.llama_get_logits_ith(self.draft.ctx, -1)
+        return np.ctypeslib.as_array(logits, shape=(self.draft.n_vocab(),))
+
+
+class AcceptanceTracker(LlamaDraftModel):
+    """
+    Wraps a draft model and counts how many proposed tokens were accepted
+
+    llama.cpp doesn't report acceptance directly, but it calls the draft
+    model once per verification step with everything accepted so far plus
+    one newly sampled token, so the growth of the input between calls
+    tells how many of the previous proposals were kept.
+    """
+
+    def __init__(self, inner: LlamaDraftModel):
+        self.inner = inner
+        self.begin()
+
+    def begin(self):
+        """Reset counters at the start of a generation"""
+        self.drafted = 0
+        self.accepted = 0
+        self._last: Optional[Tuple[int, int]] = None  # (input length, tokens proposed)
+
+    def counts(self) -> Tuple[int, int]:
+        """(proposed, accepted) for proposals resolved so far"""
+        return self.drafted, self.accepted
+
+    def __call__(self, input_ids: npt.NDArray[np.intc], /, **kwargs: Any) -> npt.NDArray[np.intc]:
+        length = len(input_ids)
+        if self._last is not None:
+            last_length, last_proposed = self._last
+            if length > last_length:
+                self.drafted += last_proposed
+                self.accepted += min(last_proposed, length - last_length - 1)
+
+        proposed = self.inner(input_ids, **kwargs)
+        self._last = (length, len(proposed))
+        return proposed
+
+
+def create_draft_model(spec_config: dict, llm_kwargs: dict) -> Optional[AcceptanceTracker]:
+    """
+    Build the configured speculative decoder, or None when disabled
+
+    Any decoder makes llama-cpp-python load the main model with
+    logits_all=True, which keeps n_ctx x n_vocab float scores in RAM.
+
+    Args:
+        spec_config: The `speculative` config section
+        llm_kwargs: Load settings (n_ctx, n_threads, ...) reused for a draft GGUF
+    """
+    mode = spec_config.get('mode', 'none')
+    num_pred_tokens = spec_config.get('num_pred_tokens', 10)
+
+    if mode == 'prompt_lookup':
+        inner = LlamaPromptLookupDecoding(
+            num_pred_tokens=num_pred_tokens,
+            max_ngram_size=spec_config.get('max_ngram_size', 2),
+        )
+    elif mode == 'draft':
+        draft_path = spec_config.get('draft_model')
+        if not draft_path:
+            raise ValueError("speculative.mode is 'draft' but speculative.draft_model is not set")
+        inner = DraftModelDecoding(
+            Llama(model_path=draft_path, verbose=False, **llm_kwargs),
+            num_pred_tokens=num_pred_tokens,
+        )
+    elif mode in ('none', None):
+        return None
+    else:
+        raise ValueError(f"Unknown speculative.mode: {mode} (use none, prompt_lookup or draft)")
+
+    return AcceptanceTracker(inner)
@@ -0,0 +1,74 @@
+"""Shared streaming layer: coalesce generated tokens into rate-limited frames"""
+import time
+from typing import Iterable, Iterator, List
+
+
+class StreamBuffer:
+    """
+    Accumulates streamed tokens and decides when the front end should redraw
+
+    Tokens are appended to a list and joined only when a frame is emitted,
+    so a long answer isn't rebuilt by repeated string concatenation, and
+    frames are capped at `fps` however fast tokens arrive.
+    """
+
+    def __init__(self, fps: float = 15):
+        self.min_interval = 1.0 / fps if fps > 0 else 0.0
+        self._parts: List[str] = []
+        self._pending = False  # Tokens arrived since the last frame
+        self._last_frame = 0.0
+
+    def append(self, token: str) -> bool:
+        """Add a token; True if a frame is due"""
+        self._parts.append(token)
+        self._pending = True
+        return time.monotonic() - self._last_frame >= self.min_interval
+
+    def text(self) -> str:
+        """Everything received so far"""
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    def frame(self) -> str:
+        """Mark a frame as drawn and return the text to draw"""
+        self._last_frame = time.monotonic()
+        self._pending = False
+        return self.text()
+
+    def frames(self, tokens: Iterable[str]) -> Iterator[str]:
+        """
+        Yield the accumulated text at most `fps` times a second
+
+        The final text is always yielded, so the last frame is complete.
+        """
+        for token in tokens:
+            if self.append(token):
+                yield self.frame()
+        if self._pending:
+            yield self.frame()
+
+
+def stable_boundary(text: str) -> int:
+    """
+    Offset up to which text holds only complete Markdown blocks
+
+    A block ends at a blank line or a closing code fence; nothing inside an
+    open fence counts. Everything before the offset renders the same however
+    the stream continues, so it can be printed once and never redrawn.
+    """
+    in_fence = False
+    boundary = 0
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        if not line.endswith("\n"):
+            break  # Incomplete last line
+        offset += len(line)
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            in_fence = not in_fence
+            if not in_fence:
+                boundary = offset
+        elif not stripped and not in_fence:
+            boundary = offset
+    return boundary
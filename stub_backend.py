@@ -0,0 +1,127 @@
+"""Deterministic stand-in for llama_cpp.Llama, for benchmarking without a GGUF file"""
+import re
+import time
+import zlib
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+
+_TOKEN_RE = re.compile(r"<\|im_(?:start|end)\|>|\w+|\s+|[^\w\s]")
+
+# Fixed reply the stub "generates", cycled until max_tokens
+_REPLY = (
+    "Here is a cleaner version:\n\n```python\ndef parse_config(path: str) -> dict:\n"
+    "    \"\"\"Load and validate the YAML config.\"\"\"\n    with open(path) as f:\n"
+    "        data = yaml.safe_load(f)\n    return data\n```\n\n"
+)
+
+_pieces: Dict[int, str] = {}
+
+
+def _token_id(piece: str) -> int:
+    """Stable ID for a text piece (same across processes, unlike a growing vocab)"""
+    token = zlib.crc32(piece.encode('utf-8')) & 0x7FFFFFFF
+    _pieces.setdefault(token, piece)
+    return token
+
+
+class StubState:
+    """Picklable snapshot mirroring llama_cpp.LlamaState"""
+
+    def __init__(self, input_ids: List[int], n_tokens: int):
+        self.input_ids = input_ids
+        self.n_tokens = n_tokens
+
+
+class StubLlama:
+    """
+    Implements the parts of the Llama API Orbit uses
+
+    Tokenization is word-level, prefix reuse mirrors llama.cpp (only tokens
+    past the longest common prefix are "evaluated") and the reply is fixed.
+    Optional per-token delays give the timings a realistic shape.
+    """
+
+    def __init__(
+        self,
+        model_path: str = "stub",
+        n_ctx: int = 8192,
+        prefill_delay: float = 0.0,
+        decode_delay: float = 0.0,
+        **kwargs,
+    ):
+        self.model_path = model_path
+        self._n_ctx = n_ctx
+        self.prefill_delay = prefill_delay
+        self.decode_delay = decode_delay
+        self.input_ids: List[int] = []
+        self.n_tokens = 0
+        self._reply_ids = self.tokenize(_REPLY.encode('utf-8'), add_bos=False)
+
+    def n_ctx(self) -> int:
+        return self._n_ctx
+
+    def tokenize(self, text: bytes, add_bos: bool = True, special: bool = False) -> List[int]:
+        return [_token_id(piece) for piece in _TOKEN_RE.findall(text.decode('utf-8', errors='replace'))]
+
+    def detokenize(self, tokens: Sequence[int], **kwargs) -> bytes:
+        return "".join(_pieces.get(t, "") for t in tokens).encode('utf-8')
+
+    def reset(self):
+        self.n_tokens = 0
+
+    def eval(self, tokens: Sequence[int]):
+        del self.input_ids[self.n_tokens:]
+        self.input_ids.extend(tokens)
+        self.n_tokens = len(self.input_ids)
+        if self.prefill_delay:
+            time.sleep(self.prefill_delay * len(tokens))
+
+    def save_state(self) -> StubState:
+        return StubState(list(self.input_ids[:self.n_tokens]), self.n_tokens)
+
+    def load_state(self, state: StubState):
+        self.input_ids = list(state.input_ids)
+        self.n_tokens = state.n_tokens
+
+    def close(self):
+        pass
+
+    def __call__(self, prompt: Union[str, List[int]], max_tokens: int = 16, stream: bool = False, **kwargs):
+        return self.create_completion(prompt, max_tokens=max_tokens, stream=stream, **kwargs)
+
+    def create_completion(
+        self,
+        prompt: Union[str, List[int]],
+        max_tokens: int = 16,
+        stream: bool = False,
+        **kwargs,
+    ) -> Union[dict, Iterator[dict]]:
+        tokens = self.tokenize(prompt.encode('utf-8')) if isinstance(prompt, str) else list(prompt)
+
+        # Reuse the longest common prefix with what's already evaluated
+        common = 0
+        for a, b in zip(self.input_ids[:self.n_tokens], tokens[:-1]):
+            if a != b:
+                break
+            common += 1
+        self.n_tokens = common
+        self.eval(tokens[common:])
+
+        chunks = self._decode(max_tokens)
+        if stream:
+            return chunks
+        text = ""
+        finish_reason = None
+        for chunk in chunks:
+            text += chunk["choices"][0]["text"]
+            finish_reason = chunk["choices"][0]["finish_reason"]
+        return {"choices": [{"text": text, "finish_reason": finish_reason}]}
+
+    def _decode(self, max_tokens: int) -> Iterator[dict]:
+        for i in range(max_tokens):
+            token = self._reply_ids[i % len(self._reply_ids)]
+            if self.decode_delay:
+                time.sleep(self.decode_delay)
+            self.eval([token])
+            finish_reason = "length" if i == max_tokens - 1 else None
+            yield {"choices": [{"text": _pieces[token], "finish_reason": finish_reason}]}
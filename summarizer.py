@@ -0,0 +1,62 @@
+"""Idle-time summarization of conversation turns that are about to be evicted"""
+from typing import Dict, List, Optional
+
+from worker import GenerationHandle
+
+
+class ConversationSummarizer:
+    """
+    Folds old turns into the ContextManager's "conversation so far" block
+
+    schedule() queues a summary on the model's worker thread right after an
+    answer, while the user reads and types. collect() runs before the next
+    request: a finished summary is applied, an unfinished one is cancelled
+    (within one token) and retried next time, so it never delays a request.
+    """
+
+    def __init__(self, model, context_mgr):
+        self.model = model
+        self.context_mgr = context_mgr
+        self._handle: Optional[GenerationHandle] = None
+        self._messages: List[Dict] = []
+        self.summaries = 0
+        self.folded_messages = 0
+        self.cancelled = 0
+
+    @property
+    def pending(self) -> bool:
+        """True while a summary job is queued or running"""
+        return self._handle is not None
+
+    def schedule(self, model_name: Optional[str] = None) -> bool:
+        """Start summarizing if turns are about to be evicted; True if a job was queued"""
+        if self._handle is not None:
+            return False
+        messages = self.context_mgr.summary_candidates()
+        if not messages:
+            return False
+
+        max_tokens = self.context_mgr.config['context'].get('summary_max_tokens', 256)
+        prompt = self.context_mgr.build_summary_prompt(messages, max_words=int(max_tokens * 0.6))
+        self._messages = messages
+        self._handle = self.model.submit(prompt, model_name=model_name, max_tokens=max_tokens, background=True)
+        return True
+
+    def collect(self) -> bool:
+        """Apply a finished summary or cancel a running one; True if the summary changed"""
+        handle, self._handle = self._handle, None
+        if handle is None:
+            return False
+        if not handle.wait(0):
+            handle.cancel()
+            handle.wait()
+            self.cancelled += 1
+            return False
+
+        summary = handle.text().strip()
+        if handle.error is not None or handle.cancelled or not summary:
+            return False
+        self.context_mgr.apply_summary(summary, self._messages)
+        self.summaries += 1
+        self.folded_messages += len(self._messages)
+        return True
@@ -0,0 +1,28 @@
+"""ContextManager token caching shared between sessions"""
+from functools import partial
+from pathlib import Path
+
+from context import ContextManager
+from file_cache import FileCache
+
+CONFIG = str(Path(__file__).resolve().parent.parent / "config.yaml")
+
+
+def test_sessions_share_memoized_system_ids():
+    encoded = []
+
+    def tokenize(text, add_bos=False, model_name=None):
+        if add_bos:
+            encoded.append(model_name)
+        return [ord(c) for c in text]
+
+    file_cache = FileCache()
+    managers = []
+    for _ in range(2):
+        manager = ContextManager(CONFIG, file_cache=file_cache, code_index=None)
+        manager.set_tokenizer(partial(tokenize, model_name="coder"), 32768, vocab="coder")  # One partial per session
+        managers.append(manager)
+
+    for turn in range(6):
+        managers[turn % 2].build_prompt_tokens(f"question {turn}")
+    assert encoded == ["coder"]  # Sessions taking turns used to evict each other's entry
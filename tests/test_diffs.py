@@ -0,0 +1,88 @@
+"""Streamed diff parsing, local patching and edit-session path checks"""
+import pytest
+
+from diffs import DiffStreamParser, EditSession, FilePatch, Hunk, PatchError, apply_patch
+
+
+def _parse(text: str, chunk: int = 7):
+    parser = DiffStreamParser()
+    for i in range(0, len(text), chunk):  # Arbitrary token boundaries
+        parser.feed(text[i:i + chunk])
+    return parser.finish()
+
+
+SQL = "select 1;\n-- comment\nselect 2;\n"
+
+
+def test_parses_two_files_around_prose():
+    patches = _parse(
+        "Here you go:\n```diff\n"
+        "--- a/x.py\n+++ b/x.py\n@@ -1,2 +1,2 @@\n a = 1\n-b = 2\n+b = 3\n"
+        "--- a/y.py\n+++ b/y.py\n@@ -1 +1 @@\n-old\n+new\n"
+        "```\nDone.\n"
+    )
+    assert [p.path for p in patches] == ["x.py", "y.py"]
+    assert patches[0].hunks[0].lines == [" a = 1", "-b = 2", "+b = 3"]
+    assert patches[1].hunks[0].new_lines == ["new"]
+
+
+def test_removed_line_that_looks_like_a_header_stays_in_the_hunk():
+    patches = _parse("--- a/q.sql\n+++ b/q.sql\n@@ -1,3 +1,2 @@\n select 1;\n--- comment\n select 2;\n")
+    assert patches[0].hunks[0].lines == [" select 1;", "--- comment", " select 2;"]
+    assert apply_patch(SQL, patches[0]) == "select 1;\nselect 2;\n"
+
+
+def test_header_after_counts_are_used_up_starts_next_file():
+    patches = _parse(
+        "--- a/q.sql\n+++ b/q.sql\n@@ -1,2 +1,1 @@\n select 1;\n--- comment\n"
+        "--- a/r.sql\n+++ b/r.sql\n@@ -1 +1 @@\n-a\n+b\n"
+    )
+    assert [p.path for p in patches] == ["q.sql", "r.sql"]
+
+
+def test_lines_past_an_undercounted_hunk_are_kept():
+    patches = _parse("--- a/x.py\n+++ b/x.py\n@@ -1 +1 @@\n-a = 1\n+a = 2\n+b = 3\n")
+    assert patches[0].hunks[0].new_lines == ["a = 2", "b = 3"]
+
+
+def test_context_only_hunk_is_rejected():
+    patch = FilePatch("q.sql", "q.sql", [Hunk(1, [" select 1;"])])
+    with pytest.raises(PatchError):
+        apply_patch(SQL, patch)
+
+
+def test_apply_tolerates_wrong_line_numbers():
+    patch = FilePatch("x.py", "x.py", [Hunk(40, [" b", "-c", "+C"])])
+    assert apply_patch("a\nb\nc\nd\n", patch) == "a\nb\nC\nd\n"
+
+
+def test_mismatched_context_is_rejected():
+    patch = FilePatch("x.py", "x.py", [Hunk(1, [" nope", "-c", "+C"])])
+    with pytest.raises(PatchError):
+        apply_patch("a\nb\nc\n", patch)
+
+
+def test_new_file_is_staged_and_written(tmp_path):
+    session = EditSession(str(tmp_path))
+    patch = FilePatch("/dev/null", "pkg/new.py", [Hunk(0, ["+x = 1"])])
+    assert session.apply(patch)[0] == "pkg/new.py"
+    assert session.write_pending() == ["pkg/new.py"]
+    assert (tmp_path / "pkg" / "new.py").read_text() == "x = 1\n"
+
+
+@pytest.mark.parametrize("path", ["../evil.py", "pkg/../../evil.py", "/tmp/evil.py"])
+def test_new_file_outside_project_is_rejected(tmp_path, path):
+    session = EditSession(str(tmp_path / "project"))
+    with pytest.raises(PatchError):
+        session.apply(FilePatch("/dev/null", path, [Hunk(0, ["+x = 1"])]))
+    session.pending[path] = "x = 1\n"
+    with pytest.raises(PatchError):
+        session.write_pending()
+    assert not (tmp_path / "evil.py").exists()
+
+
+def test_patch_for_unattached_file_is_rejected(tmp_path):
+    (tmp_path / "a.py").write_text("a\n")
+    session = EditSession(str(tmp_path))
+    with pytest.raises(PatchError):
+        session.apply(FilePatch("b.py", "b.py", [Hunk(1, ["-a", "+b"])]))
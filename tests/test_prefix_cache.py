@@ -0,0 +1,11 @@
+"""PrefixCache size cap"""
+from prefix_cache import PrefixCache
+
+
+def test_snapshot_larger_than_cap_is_not_kept(tmp_path):
+    cache = PrefixCache(str(tmp_path), max_bytes=4096)
+    cache.save("small", b"x" * 1024)
+    cache.save("huge", b"x" * 8192)
+    assert cache.load("huge") is None
+    assert cache.load("small") == b"x" * 1024  # Not evicted to make room for it
+    assert not list(tmp_path.glob("*.tmp"))
@@ -0,0 +1,38 @@
+"""CodeIndex incremental updates"""
+import os
+
+from retrieval import CodeIndex
+
+
+def _index(root) -> CodeIndex:
+    return CodeIndex(str(root), include=["*.py"], exclude=[], refresh_interval=0)
+
+
+def _touch(path, text: str):
+    path.write_text(text)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))  # mtime changes even within one tick
+
+
+def test_search_after_modifying_indexed_file(tmp_path):
+    source = tmp_path / "widget_helper.py"
+    _touch(source, "def build_widget():\n    return Widget()\n")
+    index = _index(tmp_path)
+    assert index.search("widget helper")
+
+    _touch(source, "def make_gadget():\n    return Gadget()\n")
+    results = index.search("widget helper")  # Path terms of the old chunk used to linger
+    assert [r["path"] for r in results] == ["widget_helper.py"]
+    assert "make_gadget" in results[0]["text"]
+
+
+def test_search_after_deleting_indexed_file(tmp_path):
+    _touch(tmp_path / "widget_helper.py", "def build_widget():\n    pass\n")
+    _touch(tmp_path / "other.py", "def unrelated():\n    pass\n")
+    index = _index(tmp_path)
+    assert index.search("py")
+
+    (tmp_path / "widget_helper.py").unlink()
+    assert [r["path"] for r in index.search("widget helper py")] == ["other.py"]
+    assert all(index.postings.values())
+    assert not any(chunk_id not in index.chunks for p in index.postings.values() for chunk_id in p)
@@ -0,0 +1,221 @@
+"""Hardware auto-tuning: find the fastest n_threads / n_batch for this machine
+
+Sweeps thread counts and batch sizes with short prefill and decode probes
+and saves the winner per model and host:
+
+    python orbit.py tune                       # active model
+    python orbit.py tune --model Qwen2.5-Coder-1.5B
+    python orbit.py tune --threads 8,16,24 --batches 256,512
+
+Set `n_threads: auto` / `n_batch: auto` under `performance` in config.yaml
+to load the saved profile.
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import hardware
+
+
+PROFILE_PATH = Path.home() / ".orbit_profiles.json"
+BATCH_SIZES = [128, 256, 512, 1024]
+
+_PROBE_TEXT = (
+    "def merge_intervals(intervals):\n"
+    "    \"\"\"Merge overlapping [start, end] intervals and return them sorted.\"\"\"\n"
+    "    result = []\n"
+    "    for start, end in sorted(intervals):\n"
+    "        if result and start <= result[-1][1]:\n"
+    "            result[-1][1] = max(result[-1][1], end)\n"
+    "        else:\n"
+    "            result.append([start, end])\n"
+    "    return result\n\n"
+)
+
+
+def profile_key(model_id: str, host: Optional[str] = None) -> str:
+    return f"{host or hardware.host_id()}:{model_id}"
+
+
+def load_profiles(path: Path = PROFILE_PATH) -> Dict[str, dict]:
+    """All saved profiles (empty if none or unreadable)"""
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def load_profile(model_id: str, path: Path = PROFILE_PATH) -> Optional[dict]:
+    """The saved profile for this host and model, if tuned"""
+    return load_profiles(path).get(profile_key(model_id))
+
+
+def save_profile(model_id: str, profile: dict, path: Path = PROFILE_PATH):
+    """Add or replace this host/model's profile (atomic rewrite)"""
+    profiles = load_profiles(path)
+    profiles[profile_key(model_id)] = profile
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(profiles, indent=2))
+    os.replace(tmp_path, path)
+
+
+def default_threads() -> int:
+    """Untuned fallback for n_threads: one per physical core"""
+    return hardware.physical_cores()
+
+
+def thread_candidates(cores: int, nodes: int) -> List[int]:
+    """Thread counts worth probing: fractions of the physical cores plus one NUMA node"""
+    candidates = {cores, max(1, cores // 2), max(1, cores * 3 // 4), max(1, cores // 4)}
+    if nodes > 1:
+        candidates.add(max(1, cores // nodes))
+    return sorted(candidates)
+
+
+def probe(
+    model_path: str,
+    prompt_ids: List[int],
+    decode_tokens: int,
+    n_gpu_layers: int,
+    **settings,
+) -> Tuple[float, float]:
+    """
+    Load the model with the given settings and time one prefill and a short decode
+
+    Returns:
+        (prefill tokens/s, decode tokens/s)
+    """
+    from llama_cpp import Llama
+
+    llm = Llama(
+        model_path=model_path,
+        n_ctx=len(prompt_ids) + decode_tokens + 16,
+        n_gpu_layers=n_gpu_layers,
+        verbose=False,
+        **settings,
+    )
+    try:
+        # Touch the weights once so page-cache faults don't skew the first probe
+        llm.eval(prompt_ids[:8])
+        llm.reset()
+
+        started = time.perf_counter()
+        llm.eval(prompt_ids)
+        prefill_s = time.perf_counter() - started
+
+        token = prompt_ids[-1]
+        started = time.perf_counter()
+        for _ in range(decode_tokens):
+            llm.eval([token])
+        decode_s = time.perf_counter() - started
+    finally:
+        llm.close()
+
+    return len(prompt_ids) / prefill_s, decode_tokens / decode_s
+
+
+def probe_prompt(model_path: str, n_tokens: int) -> List[int]:
+    """A code-like prompt of exactly n_tokens tokens"""
+    from llama_cpp import Llama
+
+    vocab = Llama(model_path=model_path, vocab_only=True, verbose=False)
+    ids: List[int] = []
+    while len(ids) < n_tokens:
+        ids.extend(vocab.tokenize(_PROBE_TEXT.encode('utf-8'), add_bos=not ids))
+    return ids[:n_tokens]
+
+
+def tune(model_path: str, n_gpu_layers: int, args: argparse.Namespace) -> dict:
+    """
+    Run the sweep and return the best profile
+
+    Decode is memory-bound and prefill compute-bound, so the best thread
+    count is picked separately for each (n_threads / n_threads_batch),
+    then n_batch is swept with those.
+    """
+    info = hardware.describe()
+    threads = args.threads or thread_candidates(info["physical_cores"], info["numa_nodes"])
+    batches = [b for b in (args.batches or BATCH_SIZES) if b <= args.prompt_tokens] or [args.prompt_tokens]
+    prompt_ids = probe_prompt(model_path, args.prompt_tokens)
+
+    print(
+        f"🖥️  {info['physical_cores']} physical cores, {info['numa_nodes']} NUMA node(s), "
+        f"{info['available_ram_mb'] or '?'} MB RAM available, "
+        f"GPU offload {'supported' if info['gpu_offload'] else 'not available'}"
+    )
+
+    print(f"\n🧵 Threads (n_batch 512): {threads}")
+    thread_results = {}
+    for n in threads:
+        thread_results[n] = probe(
+            model_path, prompt_ids, args.decode_tokens, n_gpu_layers,
+            n_threads=n, n_threads_batch=n, n_batch=min(512, args.prompt_tokens),
+        )
+        print(f"  {n:>3} threads: prefill {thread_results[n][0]:8.1f} tok/s, decode {thread_results[n][1]:6.1f} tok/s")
+    decode_threads = max(thread_results, key=lambda n: thread_results[n][1])
+    prefill_threads = max(thread_results, key=lambda n: thread_results[n][0])
+
+    print(f"\n📦 Batch sizes (n_threads {decode_threads}, n_threads_batch {prefill_threads}): {batches}")
+    batch_results = {}
+    for n_batch in batches:
+        batch_results[n_batch] = probe(
+            model_path, prompt_ids, args.decode_tokens, n_gpu_layers,
+            n_threads=decode_threads, n_threads_batch=prefill_threads, n_batch=n_batch,
+        )
+        print(f"  n_batch {n_batch:>5}: prefill {batch_results[n_batch][0]:8.1f} tok/s")
+    best_batch = max(batch_results, key=lambda b: batch_results[b][0])
+
+    return {
+        "n_threads": decode_threads,
+        "n_threads_batch": prefill_threads,
+        "n_batch": best_batch,
+        "prefill_tps": batch_results[best_batch][0],
+        "decode_tps": thread_results[decode_threads][1],
+        "model_path": model_path,
+        "n_gpu_layers": n_gpu_layers,
+        "hardware": info,
+        "tuned_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv: Optional[List[str]] = None):
+    """Entry point for `python orbit.py tune`"""
+    parser = argparse.ArgumentParser(prog="orbit tune", description="Find the fastest thread/batch settings for this machine")
+    parser.add_argument("--config", default="config.yaml", help="config file")
+    parser.add_argument("--model", help="registered model name (default: active model)")
+    parser.add_argument("--threads", type=_int_list, help="comma-separated thread counts to try")
+    parser.add_argument("--batches", type=_int_list, help="comma-separated n_batch values to try")
+    parser.add_argument("--prompt-tokens", type=int, default=1024, help="prefill probe length")
+    parser.add_argument("--decode-tokens", type=int, default=32, help="decode probe length")
+    args = parser.parse_args(argv)
+
+    from model import OrbitModel
+
+    model = OrbitModel(args.config)
+    name = args.model or model.active_model
+    model_config = model.model_config(name)
+    if model_config.get('backend') == 'stub':
+        parser.error(f"{name} uses the stub backend - nothing to tune")
+
+    print(f"🔧 Tuning {name} on {hardware.host_id()}")
+    profile = tune(model_config['path'], model.n_gpu_layers(name), args)
+    save_profile(model.model_id(name), profile)
+
+    print(
+        f"\n✅ Best: n_threads {profile['n_threads']}, n_threads_batch {profile['n_threads_batch']}, "
+        f"n_batch {profile['n_batch']} ({profile['prefill_tps']:.0f} tok/s prefill, "
+        f"{profile['decode_tps']:.1f} tok/s decode)"
+    )
+    print(f"💾 Saved to {PROFILE_PATH} - set n_threads/n_batch to auto in config.yaml to use it")
+
+
+if __name__ == "__main__":
+    main()
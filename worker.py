@@ -0,0 +1,103 @@
+"""Dedicated generation thread with cooperative cancellation"""
+import queue
+import threading
+from typing import Callable, Iterator, List, Optional
+
+
+_DONE = object()
+
+
+class GenerationHandle:
+    """
+    A job submitted to the GenerationWorker
+
+    Iterate it for the job's output; cancel() stops the job before its next
+    token is produced.
+    """
+
+    def __init__(self, job: Callable[[], Iterator[str]]):
+        self.job = job
+        self.error: Optional[BaseException] = None
+        self._parts: List[str] = []
+        self._output: "queue.Queue" = queue.Queue()
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    def cancel(self):
+        """Ask the worker to stop this job at the next token boundary"""
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job has stopped; False on timeout"""
+        return self._done.wait(timeout)
+
+    def put(self, item: str):
+        """Deliver one item of output to the reader"""
+        self._parts.append(item)
+        self._output.put(item)
+
+    def finish(self, error: Optional[BaseException] = None):
+        """Mark the job stopped; the reader's iteration ends (raising error, if any)"""
+        self.error = error
+        self._done.set()
+        self._output.put(_DONE)
+
+    def text(self) -> str:
+        """Everything the job produced so far"""
+        return "".join(self._parts)
+
+    def __iter__(self) -> Iterator[str]:
+        while True:
+            item = self._output.get()
+            if item is _DONE:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield item
+
+
+class GenerationWorker:
+    """
+    Runs jobs one at a time on a single background thread
+
+    A job is a callable returning an iterator (e.g. a bound
+    OrbitModel.generate). The cancel flag is checked after every item, and a
+    cancelled iterator is closed, so llama.cpp stops decoding and the model
+    is free for the next job within one token step.
+    """
+
+    def __init__(self, name: str = "orbit-generation"):
+        self._jobs: "queue.Queue[GenerationHandle]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, job: Callable[[], Iterator[str]]) -> GenerationHandle:
+        """Queue a job behind any running one and return its handle"""
+        handle = GenerationHandle(job)
+        self._jobs.put(handle)
+        return handle
+
+    def _run(self):
+        while True:
+            self._execute(self._jobs.get())
+
+    def _execute(self, handle: GenerationHandle):
+        stream = None
+        error = None
+        try:
+            if not handle.cancelled:  # Cancelled while still queued
+                stream = handle.job()
+                for item in stream:
+                    if handle.cancelled:
+                        break
+                    handle.put(item)
+        except Exception as e:
+            error = e
+        finally:
+            if stream is not None and hasattr(stream, 'close'):
+                stream.close()  # GeneratorExit inside generate() stops the decode
+            handle.finish(error)